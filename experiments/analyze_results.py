@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Single-pass analysis of a results file (current `records` layout).
+
+One scan computes every statistic the archived scripts
+(`cross_domain_validation.py`, `operator_analysis.py`, `generate_fig1.py`,
+`generate_fig2.py`) and `figures/generate_figures_from_results.py` derive:
+domain-level totals, operator distributions, per-scenario token/success
+statistics and per-temperature token means.
+
+  python3 experiments/analyze_results.py --report all
+  python3 experiments/analyze_results.py --results out.jsonl.gz --report domain,operators --json report.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+from typing import Any, Dict, Iterable, List
+
+from results_io import load_results, save_json
+from run_transfer_3trial import DOMAIN_PROMPTS, TRANSFER_SCENARIOS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RESULTS = os.path.join(ROOT, "data", "results", "transfer_3trial_results.json")
+DOMAIN_ORDER = list(DOMAIN_PROMPTS)
+REPORTS = ("domain", "operators", "scenarios", "tokens")
+
+
+def _counters() -> Dict[str, Any]:
+    return {"runs": 0, "turns": 0, "tokens": 0, "sigma": 0, "delta": 0, "success": 0}
+
+
+def _pct(part: int, whole: int) -> float:
+    return 100.0 * part / whole if whole else 0.0
+
+
+def analyze(records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Compute all report statistics in one pass over ``records``."""
+    overall = _counters()
+    domains: Dict[str, Dict[str, Any]] = {}
+    scenarios: Dict[str, Dict[str, Any]] = {}
+    # (scenario, temperature) -> [sum of avg_per_turn, runs]
+    temp_tokens: Dict[str, Dict[float, List[float]]] = {}
+
+    for rec in records:
+        res = rec["result"]
+        sc = rec["scenario"]
+        domain = res["domain"]
+        temperature = float(rec["temperature"])
+        turns = res["turns"]
+        sigma = sum(1 for t in turns if t.get("operator") == "sigma")
+        delta = sum(1 for t in turns if t.get("operator") == "delta")
+        success = sum(1 for t in turns if t.get("success"))
+
+        d = domains.setdefault(domain, {**_counters(), "scenarios": set()})
+        d["scenarios"].add(sc)
+        s = scenarios.setdefault(sc, {**_counters(), "domain": domain})
+        for bucket in (overall, d, s):
+            bucket["runs"] += 1
+            bucket["turns"] += len(turns)
+            bucket["tokens"] += res["total_tokens"]
+            bucket["sigma"] += sigma
+            bucket["delta"] += delta
+            bucket["success"] += success
+        acc = temp_tokens.setdefault(sc, {}).setdefault(temperature, [0.0, 0])
+        acc[0] += res["avg_per_turn"]
+        acc[1] += 1
+
+    def finish(bucket: Dict[str, Any]) -> Dict[str, Any]:
+        out = dict(bucket)
+        out["avg_tokens_per_turn"] = bucket["tokens"] / bucket["turns"] if bucket["turns"] else 0.0
+        out["sigma_pct"] = _pct(bucket["sigma"], bucket["turns"])
+        out["delta_pct"] = _pct(bucket["delta"], bucket["turns"])
+        out["success_rate"] = bucket["success"] / bucket["turns"] if bucket["turns"] else 0.0
+        return out
+
+    domain_out = {}
+    for name in sorted(domains, key=lambda x: (DOMAIN_ORDER.index(x) if x in DOMAIN_ORDER else 999, x)):
+        d = finish(domains[name])
+        d["scenarios"] = len(domains[name]["scenarios"])
+        domain_out[name] = d
+
+    known = [k for k in TRANSFER_SCENARIOS if k in scenarios]
+    order = known + sorted(k for k in scenarios if k not in TRANSFER_SCENARIOS)
+    scenario_out = {}
+    for sc in order:
+        s = finish(scenarios[sc])
+        s["avg_per_turn_by_temperature"] = {
+            t: total / n for t, (total, n) in sorted(temp_tokens[sc].items())
+        }
+        scenario_out[sc] = s
+
+    pcts = [(sc, s["sigma_pct"], s["delta_pct"]) for sc, s in scenario_out.items()]
+    all_sigma = sum(1 for _, _, dp in pcts if dp == 0)
+    all_delta = sum(1 for _, sp, _ in pcts if sp == 0)
+    patterns: Dict[str, Any] = {
+        "all_sigma": all_sigma,
+        "all_delta": all_delta,
+        "mixed": len(pcts) - all_sigma - all_delta,
+    }
+    if pcts:
+        lo = min(pcts, key=lambda x: x[1])
+        hi = max(pcts, key=lambda x: x[1])
+        patterns["min_sigma"] = {"scenario": lo[0], "sigma_pct": lo[1]}
+        patterns["max_sigma"] = {"scenario": hi[0], "sigma_pct": hi[1]}
+
+    return {
+        "overall": finish(overall),
+        "domains": domain_out,
+        "scenarios": scenario_out,
+        "patterns": patterns,
+    }
+
+
+def temperature_means(stats: Dict[str, Any], temperature: float) -> Dict[str, float]:
+    """Mean avg_per_turn per scenario at one temperature (Figure 2 bars)."""
+    out = {}
+    for sc, s in stats["scenarios"].items():
+        by_temp = s["avg_per_turn_by_temperature"]
+        if temperature in by_temp:
+            out[sc] = by_temp[temperature]
+    return out
+
+
+def print_domain_report(stats: Dict[str, Any]) -> None:
+    print("Domain-Level Statistics")
+    print("=" * 70)
+    for name, d in stats["domains"].items():
+        print(f"{name}:")
+        print(f"  Scenarios: {d['scenarios']}  Runs: {d['runs']}  Turns: {d['turns']}")
+        print(f"  Tokens: {d['tokens']}  Avg/turn: {d['avg_tokens_per_turn']:.1f}")
+        print(f"  Operators: {d['sigma']}σ, {d['delta']}δ  Extraction success: {100 * d['success_rate']:.1f}%")
+    o = stats["overall"]
+    ops = o["sigma"] + o["delta"]
+    print("-" * 70)
+    print(f"Total runs: {o['runs']}  turns: {o['turns']}  tokens: {o['tokens']}")
+    print(f"Overall avg: {o['avg_tokens_per_turn']:.1f} tokens/turn")
+    print(f"Extraction success: {o['success']}/{o['turns']} ({100 * o['success_rate']:.1f}%)")
+    if ops:
+        print(f"σ (strengthen): {o['sigma']} ({100 * o['sigma'] / ops:.1f}%)  "
+              f"δ (dampen): {o['delta']} ({100 * o['delta'] / ops:.1f}%)")
+    print()
+
+
+def print_operator_report(stats: Dict[str, Any]) -> None:
+    print("Operator Selection Patterns")
+    print("=" * 70)
+    by_domain: Dict[str, List[str]] = {}
+    for sc, s in stats["scenarios"].items():
+        by_domain.setdefault(s["domain"], []).append(sc)
+    for domain in sorted(by_domain, key=lambda x: (DOMAIN_ORDER.index(x) if x in DOMAIN_ORDER else 999, x)):
+        print(f"--- {domain} ---")
+        for sc in by_domain[domain]:
+            s = stats["scenarios"][sc]
+            print(f"  {sc}: {s['sigma']}σ ({s['sigma_pct']:.0f}%), {s['delta']}δ ({s['delta_pct']:.0f}%)")
+    p = stats["patterns"]
+    print("-" * 70)
+    print(f"100% σ: {p['all_sigma']} scenarios  100% δ: {p['all_delta']} scenarios  Mixed: {p['mixed']} scenarios")
+    if "min_sigma" in p:
+        print(f"Minimum σ usage: {p['min_sigma']['sigma_pct']:.0f}% ({p['min_sigma']['scenario']})")
+        print(f"Maximum σ usage: {p['max_sigma']['sigma_pct']:.0f}% ({p['max_sigma']['scenario']})")
+    print()
+
+
+def print_scenario_report(stats: Dict[str, Any]) -> None:
+    print("Per-Scenario Statistics")
+    print("=" * 70)
+    print(f"{'scenario':<24} {'domain':<12} {'runs':>5} {'turns':>6} {'tok/turn':>9} {'success':>8}")
+    for sc, s in stats["scenarios"].items():
+        print(f"{sc:<24} {s['domain']:<12} {s['runs']:>5} {s['turns']:>6} "
+              f"{s['avg_tokens_per_turn']:>9.1f} {100 * s['success_rate']:>7.1f}%")
+    print()
+
+
+def print_token_report(stats: Dict[str, Any], temperature: float) -> None:
+    means = temperature_means(stats, temperature)
+    print(f"Mean Tokens per Turn by Scenario (T={temperature})")
+    print("=" * 70)
+    for sc, v in means.items():
+        print(f"  {sc:<24} {v:.1f}")
+    if means:
+        print(f"  {'average':<24} {sum(means.values()) / len(means):.1f}")
+    print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Single-pass analysis of a transfer results file.")
+    parser.add_argument("--results", default=DEFAULT_RESULTS, help="Results file (any runner output format)")
+    parser.add_argument(
+        "--report", default="all", help=f"Comma-separated reports: {', '.join(REPORTS)}, or all"
+    )
+    parser.add_argument("--temperature", type=float, default=0.3, help="Temperature for the tokens report")
+    parser.add_argument("--json", metavar="PATH", help="Also write the computed statistics as JSON")
+    a = parser.parse_args()
+
+    reports = REPORTS if a.report == "all" else [x.strip() for x in a.report.split(",") if x.strip()]
+    unknown = [r for r in reports if r not in REPORTS]
+    if unknown:
+        raise ValueError(f"Unknown report(s): {unknown}")
+
+    stats = analyze(load_results(a.results, resolve_responses=False)["records"])
+    printers = {
+        "domain": lambda: print_domain_report(stats),
+        "operators": lambda: print_operator_report(stats),
+        "scenarios": lambda: print_scenario_report(stats),
+        "tokens": lambda: print_token_report(stats, a.temperature),
+    }
+    for r in reports:
+        printers[r]()
+    if a.json:
+        save_json(a.json, stats)
+        print(f"Saved: {a.json}")
+
+
+if __name__ == "__main__":
+    main()
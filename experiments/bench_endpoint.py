@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Stub OpenAI-compatible server and endpoint backend benchmark (offline).
+
+  python3 experiments/bench_endpoint.py run --requests 2000 --concurrency 32 --latency-ms 20
+  python3 experiments/bench_endpoint.py serve --port 8000 --latency-ms 20
+
+`run` starts the stub on an ephemeral port in a separate process (so client
+and server do not share a GIL) and sends the same prompts through
+EndpointClients (pooled keep-alive connections) and through one fresh urllib
+connection per request, reporting requests/s, latency percentiles, failed
+requests and the number of TCP connections the server accepted. `serve` keeps the stub running
+so the full runner can be pointed at it:
+
+  echo '{"stub": {"base_url": "http://127.0.0.1:8000/v1", "model": "stub"}}' > /tmp/endpoints.json
+  python3 experiments/run_transfer_3trial.py --scenarios-json data/transfer_scenarios.json \
+      --endpoints-json /tmp/endpoints.json --models stub --workers 16 --sleep-sec 0
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from endpoint_clients import EndpointClients
+from results_io import save_json
+from run_transfer_3trial import (
+    TRANSFER_SCENARIOS,
+    LocalClients,
+    make_prompt,
+    parse_turn_text,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS_JSON = os.path.join(ROOT, "data", "transfer_scenarios.json")
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # the default listen backlog of 5 resets connections under load
+
+
+class StubServer:
+    """/v1/chat/completions answered by LocalClients after a fixed delay.
+
+    Counters are shared-memory values so they can be read from the parent
+    when the server runs in a StubProcess.
+    """
+
+    def __init__(
+        self,
+        port: int = 0,
+        host: str = "127.0.0.1",
+        latency_s: float = 0.0,
+        counters: Optional[Tuple[Any, Any]] = None,
+    ) -> None:
+        local = LocalClients()
+        self.connections, self.requests = counters or (
+            multiprocessing.Value("i", 0),
+            multiprocessing.Value("i", 0),
+        )
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+            disable_nagle_algorithm = True  # headers and body are separate writes
+
+            def setup(self) -> None:
+                super().setup()
+                with stub.connections.get_lock():
+                    stub.connections.value += 1
+
+            def do_POST(self) -> None:  # noqa: N802 (http.server API)
+                if not self.path.endswith("/chat/completions"):
+                    self.send_error(404)
+                    return
+                req = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if latency_s:
+                    time.sleep(latency_s)
+                text, _, inp, out, _ = local.call(
+                    req["model"], req["model"], req["messages"][0]["content"],
+                    req.get("temperature", 0.0), req.get("max_tokens", 200),
+                )
+                body = json.dumps(
+                    {
+                        "object": "chat.completion",
+                        "model": req["model"],
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}}],
+                        "usage": {"prompt_tokens": inp, "completion_tokens": out, "total_tokens": inp + out},
+                    }
+                ).encode("utf-8")
+                with stub.requests.get_lock():
+                    stub.requests.value += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+        self._server = _StubHTTPServer((host, port), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _serve_stub(latency_s: float, counters: Tuple[Any, Any], ready: Any) -> None:
+    server = StubServer(latency_s=latency_s, counters=counters)
+    ready.send(server.base_url)
+    server.serve_forever()
+
+
+class StubProcess:
+    """StubServer in a child process; same base_url/connections/requests/stop interface."""
+
+    def __init__(self, latency_s: float = 0.0) -> None:
+        self.connections = multiprocessing.Value("i", 0)
+        self.requests = multiprocessing.Value("i", 0)
+        ready, child_end = multiprocessing.Pipe()
+        self._proc = multiprocessing.Process(
+            target=_serve_stub, args=(latency_s, (self.connections, self.requests), child_end), daemon=True
+        )
+        self._proc.start()
+        self.base_url: str = ready.recv()
+
+    def stop(self) -> None:
+        self._proc.terminate()
+        self._proc.join()
+
+
+def protocol_prompts() -> List[str]:
+    with open(SCENARIOS_JSON, "r", encoding="utf-8") as f:
+        scenarios = json.load(f)
+    return [
+        make_prompt(scenarios[k]["domain"], list(scenarios[k]["initial_state"]), parse_turn_text(turn))
+        for k in TRANSFER_SCENARIOS
+        for turn in scenarios[k]["turns"]
+    ]
+
+
+def fresh_connection_call(base_url: str) -> Callable[[str], None]:
+    def call(prompt: str) -> None:
+        req = urllib.request.Request(
+            base_url + "/chat/completions",
+            data=json.dumps(
+                {"model": "stub", "messages": [{"role": "user", "content": prompt}], "max_tokens": 200}
+            ).encode("utf-8"),
+            headers={"Content-Type": "application/json", "Connection": "close"},
+        )
+        with urllib.request.urlopen(req) as res:
+            res.read()
+
+    return call
+
+
+def drive(call: Callable[[str], None], prompts: List[str], n_requests: int, concurrency: int) -> Dict[str, Any]:
+    """Send n_requests with `concurrency` threads; failed requests are counted, not raised."""
+    latencies: List[float] = []
+    errors: List[str] = []
+
+    def one(i: int) -> None:
+        start = time.perf_counter()
+        try:
+            call(prompts[i % len(prompts)])
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n_requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": n_requests,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "elapsed_s": round(elapsed, 4),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(1000 * statistics.median(latencies), 3) if latencies else None,
+        "p95_ms": round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+    }
+
+
+def run_bench(n_requests: int, concurrency: int, latency_s: float) -> Dict[str, Any]:
+    prompts = protocol_prompts()
+    results: Dict[str, Any] = {}
+
+    server = StubProcess(latency_s)
+    try:
+        clients = EndpointClients(
+            {"stub": {"base_url": server.base_url, "model": "stub"}}, max_connections=concurrency
+        )
+        try:
+            pooled = lambda prompt: clients.call("stub", "stub", prompt, 0.0, 200)  # noqa: E731
+            results["pooled"] = drive(pooled, prompts, n_requests, concurrency)
+        finally:
+            clients.close()
+        results["pooled"]["connections"] = server.connections.value
+    finally:
+        server.stop()
+
+    server = StubProcess(latency_s)
+    try:
+        results["fresh"] = drive(fresh_connection_call(server.base_url), prompts, n_requests, concurrency)
+        results["fresh"]["connections"] = server.connections.value
+    finally:
+        server.stop()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the OpenAI-compatible endpoint backend.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_run = sub.add_parser("run", help="Pooled vs fresh-connection throughput against the stub")
+    p_run.add_argument("--requests", type=int, default=2000)
+    p_run.add_argument("--concurrency", type=int, default=32)
+    p_run.add_argument("--latency-ms", type=float, default=0.0, help="Simulated server latency")
+    p_run.add_argument("--out", help="Optional JSON report path")
+
+    p_serve = sub.add_parser("serve", help="Run the stub server in the foreground")
+    p_serve.add_argument("--port", type=int, default=8000)
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--latency-ms", type=float, default=0.0)
+
+    a = parser.parse_args()
+    if a.cmd == "serve":
+        server = StubServer(a.port, a.host, a.latency_ms / 1000.0).start()
+        print(f"Stub endpoint: {server.base_url} (Ctrl-C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.stop()
+        return
+
+    results = run_bench(a.requests, a.concurrency, a.latency_ms / 1000.0)
+    print(f"{'client':<8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7} {'conns':>7}")
+    for name, r in results.items():
+        print(
+            f"{name:<8} {r['requests_per_s']:>9} {r['p50_ms'] or '-':>9} {r['p95_ms'] or '-':>9} "
+            f"{r['errors']:>7} {r['connections']:>7}"
+        )
+        if r["first_error"]:
+            print(f"  first error: {r['first_error']}")
+    if a.out:
+        save_json(
+            a.out,
+            {
+                "metadata": {
+                    "created_at": datetime.now().isoformat(),
+                    "script": "bench_endpoint.py",
+                    "requests": a.requests,
+                    "concurrency": a.concurrency,
+                    "latency_ms": a.latency_ms,
+                },
+                "results": results,
+            },
+        )
+        print(f"\nSaved: {a.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the runner and analysis hot paths.
+
+  python3 experiments/bench_transfer.py run --out bench_baseline.json
+  python3 experiments/bench_transfer.py compare bench_baseline.json bench_new.json --threshold 0.2
+
+`run` times each case `--repeats` times and stores min/median seconds as a JSON
+baseline. `compare` flags cases whose median slowed down by more than the
+threshold and exits non-zero when any did.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from results_io import load_results, save_json
+from run_transfer_3trial import (
+    StateManager,
+    aggregate,
+    extract_operator,
+    make_prompt,
+    parse_turn_text,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS_JSON = os.path.join(ROOT, "data", "transfer_scenarios.json")
+RESULTS_JSON = os.path.join(ROOT, "data", "results", "transfer_3trial_results.json")
+RUNNER = os.path.join(ROOT, "experiments", "run_transfer_3trial.py")
+FIGURES = os.path.join(ROOT, "figures", "generate_figures_from_results.py")
+
+SAVE_JSON_SCALES = (1, 4, 16)
+
+
+class Skip(Exception):
+    """Raised by a case whose prerequisites are missing in this environment."""
+
+
+def _load_json(path: str) -> Any:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _subprocess_case(cmd: List[str], env: Optional[Dict[str, str]] = None) -> Callable[[], None]:
+    def run() -> None:
+        proc = subprocess.run(
+            cmd, env={**os.environ, **(env or {})}, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"{' '.join(cmd)} failed:\n{proc.stderr[-2000:]}")
+
+    return run
+
+
+def build_cases(scenarios: Dict[str, Any], results: Dict[str, Any], tmp: str) -> Dict[str, Callable[[], None]]:
+    cases: Dict[str, Callable[[], None]] = {}
+
+    rng = random.Random(0)
+    op_script = []
+    for sc in scenarios.values():
+        keys = list(sc["initial_state"])
+        op_script.append(
+            (sc["initial_state"], [(rng.choice(["sigma", "delta"]), rng.choice(keys)) for _ in range(50)])
+        )
+
+    def state_manager() -> None:
+        mgr = StateManager()
+        for initial, ops in op_script:
+            state_id = mgr.create_state(initial)
+            for op, target in ops:
+                state_id = mgr.apply_operator(state_id, op, target, 0.4)
+
+    cases["state_manager"] = state_manager
+
+    responses = []
+    for rec in results["records"]:
+        items = list(scenarios[rec["scenario"]]["initial_state"])
+        for t in rec["result"]["turns"]:
+            if "response" in t:
+                responses.append((t["response"], items))
+
+    def extract_all() -> None:
+        for text, items in responses:
+            extract_operator(text, items)
+
+    cases["extract_operator"] = extract_all
+
+    prompts = [
+        (sc["domain"], list(sc["initial_state"]), parse_turn_text(turn))
+        for sc in scenarios.values()
+        for turn in sc["turns"]
+    ]
+
+    def prompts_all() -> None:
+        for domain, items, text in prompts:
+            make_prompt(domain, items, text)
+
+    cases["make_prompt"] = prompts_all
+    cases["aggregate"] = lambda: aggregate(results)
+
+    for scale in SAVE_JSON_SCALES:
+        payload = {**results, "records": results["records"] * scale}
+        path = os.path.join(tmp, f"save_json_x{scale}.json")
+        cases[f"save_json_x{scale}"] = lambda payload=payload, path=path: save_json(path, payload)
+
+    fig_env = {"TRANSFER_RESULTS_JSON": RESULTS_JSON, "TRANSFER_FIGURES_DIR": os.path.join(tmp, "figures")}
+    figures = _subprocess_case([sys.executable, FIGURES], fig_env)
+
+    def figures_case() -> None:
+        try:
+            import matplotlib  # noqa: F401
+            import numpy  # noqa: F401
+        except ImportError as e:
+            raise Skip(f"figure dependencies missing: {e.name}")
+        figures()
+
+    cases["figures"] = figures_case
+    cases["e2e_local"] = _subprocess_case(
+        [
+            sys.executable,
+            RUNNER,
+            "--scenarios-json",
+            SCENARIOS_JSON,
+            "--out",
+            os.path.join(tmp, "e2e_local.json"),
+            "--provider",
+            "local",
+            "--sleep-sec",
+            "0",
+        ]
+    )
+    return cases
+
+
+def time_case(fn: Callable[[], None], repeats: int) -> Dict[str, Any]:
+    fn()  # warm-up (imports, file cache)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "status": "ok",
+        "repeats": repeats,
+        "min_s": round(min(samples), 6),
+        "median_s": round(statistics.median(samples), 6),
+    }
+
+
+def run_benchmarks(out: str, repeats: int, only: Optional[List[str]]) -> Dict[str, Any]:
+    scenarios = _load_json(SCENARIOS_JSON)
+    results = load_results(RESULTS_JSON)
+    report: Dict[str, Any] = {
+        "metadata": {
+            "created_at": datetime.now().isoformat(),
+            "script": "bench_transfer.py",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeats": repeats,
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = build_cases(scenarios, results, tmp)
+        for name, fn in cases.items():
+            if only and name not in only:
+                continue
+            try:
+                res = time_case(fn, repeats)
+            except Skip as e:
+                res = {"status": "skipped", "reason": str(e)}
+            except Exception as e:  # keep the rest of the suite and the baseline
+                res = {"status": "error", "reason": f"{type(e).__name__}: {e}"}
+            report["results"][name] = res
+            if res["status"] == "ok":
+                print(f"{name:<18} median {1000 * res['median_s']:10.3f} ms  min {1000 * res['min_s']:10.3f} ms")
+            else:
+                print(f"{name:<18} {res['status']} ({res['reason']})")
+    save_json(out, report)
+    print(f"\nSaved: {out}")
+    return report
+
+
+def compare(base_path: str, new_path: str, threshold: float) -> int:
+    base = _load_json(base_path)["results"]
+    new = _load_json(new_path)["results"]
+    regressions = lost = 0
+    print(f"{'case':<18} {'base ms':>10} {'new ms':>10} {'ratio':>7}")
+    for name in sorted(set(base) | set(new)):
+        b, n = base.get(name), new.get(name)
+        if not b or not n or b.get("status") != "ok" or n.get("status") != "ok":
+            flag = ""
+            if b and b.get("status") == "ok":
+                # A case that was measured before must still be measured.
+                flag = f"  LOST ({n.get('status', 'missing') if n else 'missing'})"
+                lost += 1
+            print(f"{name:<18} {'-':>10} {'-':>10} {'n/a':>7}{flag}")
+            continue
+        ratio = n["median_s"] / b["median_s"] if b["median_s"] else float("inf")
+        flag = ""
+        if ratio > 1.0 + threshold:
+            flag = "  SLOWER"
+            regressions += 1
+        print(f"{name:<18} {1000 * b['median_s']:>10.3f} {1000 * n['median_s']:>10.3f} {ratio:>6.2f}x{flag}")
+    print(f"\n{regressions} case(s) slower than {1.0 + threshold:.2f}x baseline, {lost} case(s) lost")
+    return 1 if regressions or lost else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark runner and analysis hot paths.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_run = sub.add_parser("run", help="Run the suite and write a JSON baseline")
+    p_run.add_argument(
+        "--out", default=f"bench_transfer_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    p_run.add_argument("--repeats", type=int, default=5)
+    p_run.add_argument("--only", help="Comma-separated case names")
+
+    p_cmp = sub.add_parser("compare", help="Compare two baselines and flag slowdowns")
+    p_cmp.add_argument("base")
+    p_cmp.add_argument("new")
+    p_cmp.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown (0.2 = +20%%)")
+
+    a = parser.parse_args()
+    if a.cmd == "run":
+        only = [x.strip() for x in a.only.split(",") if x.strip()] if a.only else None
+        run_benchmarks(a.out, a.repeats, only)
+    else:
+        sys.exit(compare(a.base, a.new, a.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Validate scenario definitions once and compile them into a scenario pack.
+
+The pack is loaded by `run_transfer_3trial.py --scenarios-pack` without
+re-validating or re-executing notebook cells. Loading fails once the source
+file next to the pack no longer matches the hash recorded at compile time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from results_io import file_sha256
+from run_transfer_3trial import (
+    load_scenario_pack,
+    load_scenarios_from_notebook,
+    validate_scenarios,
+    write_scenario_pack,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_JSON = os.path.join(ROOT, "data", "transfer_scenarios.json")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Validate and compile transfer scenarios.")
+    parser.add_argument("--scenarios-json", help=f"Scenario JSON (default: {DEFAULT_JSON})")
+    parser.add_argument("--notebook", help="Legacy notebook defining SCENARIOS[...] dicts")
+    parser.add_argument("--out", help="Pack path (default: <source>.pack)")
+    parser.add_argument("--check", action="store_true", help="Validate only; do not write a pack")
+    parser.add_argument(
+        "--cache-dir",
+        help="Notebook extraction cache (default: $TRANSFER_CACHE_DIR or ~/.cache/nrr-transfer)",
+    )
+    a = parser.parse_args()
+
+    if a.notebook:
+        source = a.notebook
+        scenarios = load_scenarios_from_notebook(source, cache_dir=a.cache_dir)
+    else:
+        source = a.scenarios_json or DEFAULT_JSON
+        with open(source, "r", encoding="utf-8") as f:
+            scenarios = json.load(f)
+
+    errors = validate_scenarios(scenarios)
+    if errors:
+        print(f"{len(errors)} problem(s) in {source}:", file=sys.stderr)
+        for e in errors:
+            print(f"- {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"OK: {len(scenarios)} scenarios in {source}")
+    if a.check:
+        return
+
+    out = a.out or f"{os.path.splitext(source)[0]}.pack"
+    header = write_scenario_pack(out, scenarios, os.path.basename(source), file_sha256(source))
+    start = time.perf_counter()
+    load_scenario_pack(out)
+    load_ms = 1000.0 * (time.perf_counter() - start)
+    print(
+        f"Saved: {out} ({header['scenario_count']} scenarios, {header['item_count']} items, "
+        f"body sha256 {header['body_sha256'][:12]}, load {load_ms:.2f} ms)"
+    )
+
+
+if __name__ == "__main__":
+    main()
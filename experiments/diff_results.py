@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Diff two results files turn by turn.
+
+Both files are streamed with iter_records and reduced to one small tuple per
+(model, temperature, trial, scenario, turn), so memory grows with the number
+of turns, not with file size or response text. Reports per-condition
+(scenario, model, temperature) deltas in tokens per turn, success rate and
+trial consistency, how many shared turns changed operator or target, and
+records/turns present in only one file.
+
+  python3 experiments/diff_results.py data/results/transfer_3trial_results.json rerun.jsonl.gz
+  python3 experiments/diff_results.py base.json new.json --all --json diff.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from results_io import iter_records, save_json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASE = os.path.join(ROOT, "data", "results", "transfer_3trial_results.json")
+
+RecordKey = Tuple[str, float, int, str]  # (model, temperature, trial, scenario)
+Turn = Tuple[int, bool, Optional[str], Optional[str]]  # (total_tokens, success, operator, target)
+
+
+def index_turns(path: str) -> Dict[RecordKey, Dict[int, Turn]]:
+    index: Dict[RecordKey, Dict[int, Turn]] = {}
+    for rec in iter_records(path):
+        key = (rec["model"], float(rec["temperature"]), int(rec["trial"]), rec["scenario"])
+        index[key] = {
+            t["turn"]: (
+                int(t.get("total_tokens", 0) or 0),
+                bool(t.get("success")),
+                t.get("operator"),
+                t.get("target"),
+            )
+            for t in rec["result"]["turns"]
+        }
+    return index
+
+
+def _condition_stats(trials: List[Dict[int, Turn]]) -> Dict[str, Any]:
+    turns = [t for trial in trials for t in trial.values()]
+    n = len(turns)
+    shared = set.intersection(*(set(trial) for trial in trials)) if trials else set()
+    consistent = sum(1 for i in shared if len({trial[i][2:] for trial in trials}) == 1)
+    return {
+        "n_trials": len(trials),
+        "tokens_per_turn": sum(t[0] for t in turns) / n if n else 0.0,
+        "success_rate": sum(1 for t in turns if t[1]) / n if n else 0.0,
+        # Same definition as aggregate(): share of turns where every trial agrees.
+        "consistency": (consistent / len(shared) if shared else 0.0) if len(trials) >= 2 else 0.0,
+    }
+
+
+def diff_results(base: Dict[RecordKey, Dict[int, Turn]], new: Dict[RecordKey, Dict[int, Turn]]) -> Dict[str, Any]:
+    conditions: Dict[Tuple[str, str, float], Dict[str, List[RecordKey]]] = {}
+    for side, index in (("base", base), ("new", new)):
+        for key in index:
+            model, temperature, _, scenario = key
+            conditions.setdefault((scenario, model, temperature), {"base": [], "new": []})[side].append(key)
+
+    rows = []
+    totals = {"shared_turns": 0, "operator_changed": 0, "target_changed": 0, "missing_turns": 0, "extra_turns": 0}
+    for (scenario, model, temperature), keys in sorted(conditions.items(), key=lambda x: (x[0][2], x[0][1], x[0][0])):
+        a = _condition_stats([base[k] for k in keys["base"]])
+        b = _condition_stats([new[k] for k in keys["new"]])
+        shared = op_changed = target_changed = missing_turns = extra_turns = 0
+        for k in set(keys["base"]) & set(keys["new"]):
+            ta, tb = base[k], new[k]
+            missing_turns += len(ta.keys() - tb.keys())
+            extra_turns += len(tb.keys() - ta.keys())
+            for i in ta.keys() & tb.keys():
+                shared += 1
+                op_changed += ta[i][2] != tb[i][2]
+                target_changed += ta[i][3] != tb[i][3]
+        row = {
+            "scenario": scenario,
+            "model": model,
+            "temperature": temperature,
+            "base": a,
+            "new": b,
+            "delta": {m: round(b[m] - a[m], 6) for m in ("tokens_per_turn", "success_rate", "consistency")},
+            "shared_turns": shared,
+            "operator_changed": op_changed,
+            "target_changed": target_changed,
+            "missing_records": sorted(set(keys["base"]) - set(keys["new"])),
+            "extra_records": sorted(set(keys["new"]) - set(keys["base"])),
+            "missing_turns": missing_turns,
+            "extra_turns": extra_turns,
+        }
+        row["changed"] = bool(
+            any(row["delta"].values())
+            or op_changed
+            or target_changed
+            or row["missing_records"]
+            or row["extra_records"]
+            or missing_turns
+            or extra_turns
+        )
+        for name in ("shared_turns", "operator_changed", "target_changed", "missing_turns", "extra_turns"):
+            totals[name] += row[name]
+        rows.append(row)
+
+    totals["conditions"] = len(rows)
+    totals["changed_conditions"] = sum(1 for r in rows if r["changed"])
+    totals["missing_records"] = len(base.keys() - new.keys())
+    totals["extra_records"] = len(new.keys() - base.keys())
+    return {"summary": totals, "conditions": rows}
+
+
+def print_diff(diff: Dict[str, Any], show_all: bool) -> None:
+    print(
+        f"{'scenario':<24} {'model':<8} {'temp':>5} {'Δtok/turn':>10} {'Δsuccess':>9} "
+        f"{'Δconsist':>9} {'op chg':>7} {'tgt chg':>8} {'miss':>5} {'extra':>6}"
+    )
+    for r in diff["conditions"]:
+        if not (show_all or r["changed"]):
+            continue
+        d = r["delta"]
+        print(
+            f"{r['scenario']:<24} {r['model']:<8} {r['temperature']:>5} {d['tokens_per_turn']:>+10.2f} "
+            f"{d['success_rate']:>+9.3f} {d['consistency']:>+9.3f} {r['operator_changed']:>7} "
+            f"{r['target_changed']:>8} {len(r['missing_records']):>5} {len(r['extra_records']):>6}"
+        )
+    s = diff["summary"]
+    print("-" * 100)
+    print(f"Conditions: {s['conditions']} ({s['changed_conditions']} changed)")
+    print(
+        f"Shared turns: {s['shared_turns']}  operator changed: {s['operator_changed']}  "
+        f"target changed: {s['target_changed']}"
+    )
+    print(
+        f"Missing in new: {s['missing_records']} record(s), {s['missing_turns']} turn(s)  "
+        f"Extra in new: {s['extra_records']} record(s), {s['extra_turns']} turn(s)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Diff two transfer results files turn by turn.")
+    parser.add_argument("base", nargs="?", default=DEFAULT_BASE, help="Reference results (default: canonical run log)")
+    parser.add_argument("new", help="Results to compare (any runner output format)")
+    parser.add_argument("--all", action="store_true", help="List unchanged conditions too")
+    parser.add_argument("--json", metavar="PATH", help="Also write the full diff as JSON")
+    parser.add_argument(
+        "--fail-on-change", action="store_true", help="Exit 1 when any condition differs"
+    )
+    a = parser.parse_args()
+
+    diff = diff_results(index_turns(a.base), index_turns(a.new))
+    print_diff(diff, a.all)
+    if a.json:
+        save_json(a.json, diff)
+        print(f"Saved: {a.json}")
+    if a.fail_on_change and diff["summary"]["changed_conditions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
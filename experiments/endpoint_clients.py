@@ -0,0 +1,153 @@
+"""
+OpenAI-compatible chat completions backend for self-hosted models.
+
+Endpoints are configured per model key in a JSON file:
+
+  {
+    "llama": {"base_url": "http://127.0.0.1:8000/v1", "model": "meta-llama/Llama-3.1-8B-Instruct"},
+    "qwen": {"base_url": "http://gpu-2:8000/v1", "model": "Qwen/Qwen2.5-7B-Instruct",
+             "api_key_env": "QWEN_API_KEY", "timeout_s": 120}
+  }
+
+EndpointClients keeps a pool of keep-alive `http.client` connections per
+endpoint (at most `max_connections` each). `call()` is synchronous and
+thread-safe: each runner worker takes an idle connection, sends its request
+on its own thread and puts the connection back, so requests overlap without
+an event loop or a third-party HTTP stack. A pooled connection the server
+has closed in the meantime is replaced and the request is sent once more.
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+ENDPOINT_KEYS = ("base_url", "model", "api_key_env", "timeout_s")
+
+
+def load_endpoints(path: str) -> Dict[str, Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        endpoints = json.load(f)
+    if not isinstance(endpoints, dict) or not endpoints:
+        raise ValueError(f"{path}: expected a non-empty object of model key -> endpoint")
+    for key, spec in endpoints.items():
+        if not isinstance(spec, dict) or not spec.get("base_url") or not spec.get("model"):
+            raise ValueError(f"{path}: endpoint {key!r} needs 'base_url' and 'model'")
+        unknown = sorted(set(spec) - set(ENDPOINT_KEYS))
+        if unknown:
+            raise ValueError(f"{path}: endpoint {key!r} has unknown field(s) {unknown}")
+    return endpoints
+
+
+class _ConnectionPool:
+    """Keep-alive HTTP(S) connections to one server, reused LIFO."""
+
+    def __init__(self, base_url: str, max_connections: int, timeout: float) -> None:
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Unsupported endpoint base_url: {base_url!r}")
+        self._connection_cls = (
+            http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        )
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path.rstrip("/") + "/chat/completions"
+        self.timeout = timeout
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def post(self, body: bytes, headers: Dict[str, str]) -> Tuple[int, bytes]:
+        with self._slots:
+            while True:
+                with self._lock:
+                    conn = self._idle.pop() if self._idle else None
+                reused = conn is not None
+                if conn is None:
+                    # http.client sets TCP_NODELAY and sends headers and body in one write.
+                    conn = self._connection_cls(self.host, self.port, timeout=self.timeout)
+                try:
+                    conn.request("POST", self.path, body, headers)
+                    res = conn.getresponse()
+                    data = res.read()
+                except (ConnectionError, http.client.BadStatusLine):
+                    conn.close()
+                    if reused:
+                        continue  # the server dropped an idle keep-alive connection
+                    raise
+                except BaseException:
+                    conn.close()
+                    raise
+                if res.will_close:
+                    conn.close()
+                else:
+                    with self._lock:
+                        self._idle.append(conn)
+                return res.status, data
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class EndpointClients:
+    def __init__(self, endpoints: Dict[str, Dict[str, Any]], max_connections: int = 32) -> None:
+        self.endpoints = endpoints
+        self._headers: Dict[str, Dict[str, str]] = {}
+        self._pools: Dict[str, _ConnectionPool] = {}
+        for key, spec in endpoints.items():
+            headers = {"Content-Type": "application/json"}
+            if spec.get("api_key_env"):
+                api_key = os.getenv(spec["api_key_env"])
+                if not api_key:
+                    raise RuntimeError(f"Missing {spec['api_key_env']} for endpoint {key!r}.")
+                headers["Authorization"] = f"Bearer {api_key}"
+            self._headers[key] = headers
+            self._pools[key] = _ConnectionPool(
+                spec["base_url"], max_connections, float(spec.get("timeout_s", 60.0))
+            )
+
+    def call(
+        self,
+        model: str,
+        model_id: str,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> Tuple[str, int, int, int, int]:
+        """Same contract as LLMClients.call; the prefix is sent inline (servers cache it implicitly)."""
+        if model not in self.endpoints:
+            raise ValueError(f"Unknown endpoint: {model}")
+        spec = self.endpoints[model]
+        payload = {
+            "model": spec["model"],
+            "messages": [{"role": "user", "content": cache_prefix + prompt}],
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        status, data = self._pools[model].post(json.dumps(payload).encode("utf-8"), self._headers[model])
+        if status >= 400:
+            raise RuntimeError(f"Endpoint {model!r} returned HTTP {status}: {data[:200]!r}")
+        body = json.loads(data)
+        text = body["choices"][0]["message"].get("content") or ""
+        usage = body.get("usage") or {}
+        inp = int(usage.get("prompt_tokens", 0) or 0)
+        out = int(usage.get("completion_tokens", 0) or 0)
+        cached = int((usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0) or 0)
+        return text, inp + out, inp, out, cached
+
+    def close(self) -> None:
+        for pool in self._pools.values():
+            pool.close()
+
+
+def endpoint_summary(endpoints: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, str]]:
+    """Metadata-safe view of the endpoint config (no credentials)."""
+    return {k: {"base_url": v["base_url"], "model": v["model"]} for k, v in (endpoints or {}).items()}
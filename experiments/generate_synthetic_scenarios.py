@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Synthetic scenario generator for scale and stress testing.
+
+Emits scenario files in the `data/transfer_scenarios.json` schema with a
+configurable item count, turn count, domain mix and share of Japanese turn
+text (as in the `spring` scenario). Every turn carries an `expected`
+[operator, target] label, and the output passes `validate_scenarios`.
+
+  python3 experiments/generate_synthetic_scenarios.py --scenarios 100 --items 200 --turns 50 \
+      --out /tmp/synthetic_scenarios.json
+  python3 experiments/run_transfer_3trial.py --scenarios-json /tmp/synthetic_scenarios.json \
+      --scenario-keys all --provider local --sleep-sec 0 --trials 1 --temperatures 0.0 --models gpt
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+from typing import Any, Dict, List
+
+from results_io import save_json
+from run_transfer_3trial import DOMAIN_PROMPTS, OPERATORS, validate_scenarios
+
+ITEM_PREFIX = {
+    "IME": "sense",
+    "RAG": "doc",
+    "Agent": "task",
+    "Planning": "task",
+    "Multi-agent": "expert",
+    "Multimodal": "design",
+}
+
+# (English, Japanese) templates per operator; {item} is the expected target.
+TURN_TEMPLATES = {
+    "sigma": [
+        ("New evidence points to {item}.", "{item}を支持する新しい情報"),
+        ("Users keep asking about {item}.", "{item}についての問い合わせが増えた"),
+        ("{item} just became urgent.", "{item}が急に重要になった"),
+    ],
+    "delta": [
+        ("{item} no longer looks relevant.", "{item}はもう関係なさそうだ"),
+        ("Feedback on {item} was negative.", "{item}への評価は低かった"),
+        ("{item} can wait until later.", "{item}は後回しでよい"),
+    ],
+}
+
+
+def item_names(domain: str, n_items: int) -> List[str]:
+    # Fixed-width names keep every item from being a substring of another,
+    # which extract_operator's first-match lookup relies on.
+    width = max(4, len(str(n_items - 1)))
+    return [f"{ITEM_PREFIX[domain]}_{i:0{width}d}" for i in range(n_items)]
+
+
+def generate_scenarios(
+    n_scenarios: int,
+    n_items: int,
+    n_turns: int,
+    domains: List[str],
+    multilingual: float,
+    sigma_ratio: float,
+    seed: int,
+) -> Dict[str, Dict[str, Any]]:
+    rng = random.Random(seed)
+    width = max(4, len(str(n_scenarios - 1)))
+    scenarios: Dict[str, Dict[str, Any]] = {}
+    for s in range(n_scenarios):
+        domain = domains[s % len(domains)]
+        items = item_names(domain, n_items)
+        turns = []
+        for _ in range(n_turns):
+            op = OPERATORS[0] if rng.random() < sigma_ratio else OPERATORS[1]
+            target = rng.choice(items)
+            en, ja = rng.choice(TURN_TEMPLATES[op])
+            template = ja if rng.random() < multilingual else en
+            turns.append({"text": template.format(item=target), "expected": [op, target]})
+        scenarios[f"synthetic_{s:0{width}d}"] = {
+            "name": f"Synthetic {domain} ({n_items} items, {n_turns} turns)",
+            "domain": domain,
+            "initial_state": {k: round(rng.uniform(0.05, 1.0), 4) for k in items},
+            "turns": turns,
+        }
+    return scenarios
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic transfer scenarios.")
+    parser.add_argument("--scenarios", type=int, default=18)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument(
+        "--domains", default=",".join(DOMAIN_PROMPTS), help="Comma-separated domains, used round-robin"
+    )
+    parser.add_argument("--multilingual", type=float, default=0.2, help="Share of Japanese turn text")
+    parser.add_argument("--sigma-ratio", type=float, default=0.7, help="Share of sigma expected labels")
+    parser.add_argument("--seed", type=int, default=20260208)
+    parser.add_argument("--out", required=True)
+    a = parser.parse_args()
+
+    domains = [x.strip() for x in a.domains.split(",") if x.strip()]
+    unknown = [d for d in domains if d not in DOMAIN_PROMPTS]
+    if unknown:
+        raise ValueError(f"Unknown domain(s): {unknown}")
+    if a.items < 1 or a.turns < 1 or a.scenarios < 1:
+        raise ValueError("--scenarios, --items and --turns must be >= 1")
+
+    scenarios = generate_scenarios(
+        a.scenarios, a.items, a.turns, domains, a.multilingual, a.sigma_ratio, a.seed
+    )
+    errors = validate_scenarios(scenarios)
+    if errors:
+        raise ValueError("Generated invalid scenarios:\n- " + "\n- ".join(errors[:20]))
+    save_json(a.out, scenarios)
+    print(f"Saved: {a.out} ({a.scenarios} scenarios x {a.turns} turns, {a.items} items each)")
+
+
+if __name__ == "__main__":
+    main()
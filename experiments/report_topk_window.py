@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Token/latency report for top-k item windowing on synthetic large scenarios.
+
+Compares the full-list prompt (StateManager + make_prompt over every item)
+against the large-candidate mode (SparseStateManager + top-k window plus an
+exploration slice). No provider is called: input tokens are estimated from the
+rendered prompts and latency covers prompt build + state update per turn.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+from results_io import save_json
+from run_transfer_3trial import (
+    DOMAIN_PROMPTS,
+    SparseStateManager,
+    StateManager,
+    estimate_tokens,
+    make_prompt,
+)
+
+
+def synthetic_run(n_items: int, n_turns: int, seed: int) -> Dict[str, Any]:
+    """A random item set plus a fixed per-turn (operator, target) script."""
+    rng = random.Random(seed)
+    items = {f"doc_{i:05d}": rng.random() + 0.01 for i in range(n_items)}
+    keys = list(items)
+    script = [
+        (rng.choice(["sigma", "delta"]), rng.choice(keys), f"synthetic turn {t}")
+        for t in range(n_turns)
+    ]
+    return {"items": items, "script": script}
+
+
+def _measure(
+    run: Dict[str, Any], domain: str, alpha: float, top_k: int, explore: int
+) -> Dict[str, float]:
+    windowed = top_k > 0
+    mgr: Any = SparseStateManager() if windowed else StateManager()
+    rng = random.Random(0)
+    state_id = mgr.create_state(run["items"])
+
+    tokens = 0
+    start = time.perf_counter()
+    for op, target, text in run["script"]:
+        if windowed:
+            shown = mgr.window(state_id, top_k, explore, rng)
+        else:
+            shown = list(mgr.get_state(state_id)["items"].keys())
+        tokens += estimate_tokens(make_prompt(domain, shown, text))
+        # Mirror the runner: the model can only pick among the items it saw.
+        state_id = mgr.apply_operator(state_id, op, target if target in shown else shown[0], alpha)
+    elapsed = time.perf_counter() - start
+
+    n_turns = len(run["script"])
+    return {
+        "input_tokens_est": tokens,
+        "input_tokens_per_turn": round(tokens / n_turns, 2),
+        "ms_per_turn": round(1000.0 * elapsed / n_turns, 4),
+    }
+
+
+def build_report(
+    sizes: List[int], n_turns: int, top_k: int, explore: int, domain: str, alpha: float, seed: int
+) -> Dict[str, Any]:
+    rows = []
+    for n_items in sizes:
+        run = synthetic_run(n_items, n_turns, seed)
+        full = _measure(run, domain, alpha, 0, 0)
+        window = _measure(run, domain, alpha, top_k, explore)
+        rows.append(
+            {
+                "n_items": n_items,
+                "full": full,
+                "window": window,
+                "token_saving": round(1 - window["input_tokens_est"] / full["input_tokens_est"], 4),
+                "latency_speedup": (
+                    round(full["ms_per_turn"] / window["ms_per_turn"], 2)
+                    if window["ms_per_turn"]
+                    else None
+                ),
+            }
+        )
+    return {
+        "settings": {
+            "n_turns": n_turns,
+            "top_k": top_k,
+            "explore": explore,
+            "domain": domain,
+            "alpha": alpha,
+            "seed": seed,
+            "token_estimate": "utf-8 bytes / 4",
+        },
+        "rows": rows,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report top-k windowing savings vs full-list prompts.")
+    parser.add_argument("--sizes", default="50,200,1000,5000", help="Comma-separated item counts")
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--explore", type=int, default=2)
+    parser.add_argument("--domain", default="RAG", choices=sorted(DOMAIN_PROMPTS))
+    parser.add_argument("--alpha", type=float, default=0.4)
+    parser.add_argument("--seed", type=int, default=20260208)
+    parser.add_argument("--out", help="Optional JSON output path")
+    a = parser.parse_args()
+
+    sizes = [int(x) for x in a.sizes.split(",") if x.strip()]
+    report = build_report(sizes, a.turns, a.top_k, a.explore, a.domain, a.alpha, a.seed)
+
+    print(f"{'items':>7} {'full tok/turn':>14} {'window tok/turn':>16} {'saving':>8} "
+          f"{'full ms/turn':>13} {'window ms/turn':>15} {'speedup':>8}")
+    for r in report["rows"]:
+        print(
+            f"{r['n_items']:>7} {r['full']['input_tokens_per_turn']:>14} "
+            f"{r['window']['input_tokens_per_turn']:>16} {100 * r['token_saving']:>7.1f}% "
+            f"{r['full']['ms_per_turn']:>13} {r['window']['ms_per_turn']:>15} "
+            f"{r['latency_speedup'] or 0:>7}x"
+        )
+    if a.out:
+        save_json(a.out, report)
+        print(f"\nSaved: {a.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Indexed catalog of results files (sqlite3, standard library only).
+
+`ingest` stores each file's metadata block in `runs` and its
+`aggregation.by_condition` rows in `conditions`, so queries across many sweeps
+read indexed, pre-aggregated rows instead of rescanning results files. A run
+is identified by its metadata (created_at, script, seed, models), not by the
+file: ingesting the same sweep again, from a later checkpoint or another
+output format, replaces its rows. Files without `created_at` fall back to the
+file sha256.
+
+  python3 experiments/results_catalog.py ingest data/results/transfer_3trial_results.json out/*.jsonl.gz
+  python3 experiments/results_catalog.py runs --since 2026-02-01
+  python3 experiments/results_catalog.py query --metric success_rate_mean --by model \
+      --temperature 0.0 --since 2026-02-01
+
+The database defaults to `$TRANSFER_CATALOG_DB`, else `catalog.sqlite3` in the
+runner cache directory (`$TRANSFER_CACHE_DIR`, default `~/.cache/nrr-transfer`).
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from results_io import file_sha256, load_results, save_json
+from run_transfer_3trial import aggregate, default_cache_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    run_key TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    file_sha256 TEXT NOT NULL,
+    created_at TEXT,
+    script TEXT,
+    provider TEXT,
+    alpha REAL,
+    seed INTEGER,
+    max_tokens INTEGER,
+    trials INTEGER,
+    n_records INTEGER NOT NULL,
+    metadata_json TEXT NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_created_at ON runs (created_at);
+CREATE INDEX IF NOT EXISTS runs_file_sha256 ON runs (file_sha256);
+
+CREATE TABLE IF NOT EXISTS run_models (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    model TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    PRIMARY KEY (run_id, model)
+);
+CREATE INDEX IF NOT EXISTS run_models_model_id ON run_models (model_id);
+
+CREATE TABLE IF NOT EXISTS conditions (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    scenario TEXT NOT NULL,
+    domain TEXT,
+    model TEXT NOT NULL,
+    model_id TEXT,
+    temperature REAL NOT NULL,
+    n_trials INTEGER NOT NULL,
+    avg_tokens_per_turn_mean REAL,
+    avg_tokens_per_turn_std REAL,
+    success_rate_mean REAL,
+    success_rate_std REAL,
+    trial_turn_consistency REAL,
+    cached_input_tokens INTEGER,
+    uncached_input_tokens INTEGER,
+    cached_input_ratio REAL,
+    PRIMARY KEY (run_id, scenario, model, temperature)
+);
+CREATE INDEX IF NOT EXISTS conditions_model_temperature ON conditions (model, temperature);
+CREATE INDEX IF NOT EXISTS conditions_scenario ON conditions (scenario);
+CREATE INDEX IF NOT EXISTS conditions_domain ON conditions (domain);
+"""
+
+METRICS = (
+    "avg_tokens_per_turn_mean",
+    "avg_tokens_per_turn_std",
+    "success_rate_mean",
+    "success_rate_std",
+    "trial_turn_consistency",
+    "cached_input_tokens",
+    "uncached_input_tokens",
+    "cached_input_ratio",
+    "n_trials",
+)
+SCHEMA_VERSION = 2
+RUN_COLUMNS = ("provider", "alpha", "seed")  # stored once per run in `runs`
+GROUP_BY = ("model", "model_id", "temperature", "scenario", "domain", "run_id") + RUN_COLUMNS
+AGGREGATES = ("avg", "min", "max", "sum")
+
+
+def default_db_path() -> str:
+    return os.getenv("TRANSFER_CATALOG_DB") or os.path.join(default_cache_dir(), "catalog.sqlite3")
+
+
+def connect(db_path: Optional[str] = None) -> sqlite3.Connection:
+    db_path = db_path or default_db_path()
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    has_runs = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'runs'").fetchone()
+    if has_runs and version < SCHEMA_VERSION:
+        conn.close()
+        raise ValueError(f"{db_path}: catalog predates run identity keys; delete it and ingest again")
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+
+def run_key(meta: Dict[str, Any], digest: str) -> str:
+    """Identity of the sweep a results file belongs to (stable across checkpoints and formats)."""
+    if not meta.get("created_at"):
+        return f"file:{digest}"
+    identity = {k: meta.get(k) for k in ("created_at", "script", "seed", "models")}
+    blob = json.dumps(identity, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return "meta:" + hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def ingest(conn: sqlite3.Connection, path: str) -> Tuple[int, str]:
+    """Add one results file; returns (run_id, "added" | "replaced" | "unchanged").
+
+    A file whose run is already catalogued replaces that run's rows; a file
+    with the same sha256 as a catalogued one is skipped.
+    """
+    digest = file_sha256(path)
+    same_file = conn.execute("SELECT run_id FROM runs WHERE file_sha256 = ?", (digest,)).fetchone()
+    if same_file is not None:
+        return same_file["run_id"], "unchanged"
+
+    payload = load_results(path, resolve_responses=False)
+    meta = payload.get("metadata", {})
+    key = run_key(meta, digest)
+    existing = conn.execute("SELECT run_id FROM runs WHERE run_key = ?", (key,)).fetchone()
+
+    by_condition = (payload.get("aggregation") or {}).get("by_condition")
+    if by_condition is None:
+        by_condition = aggregate(payload)["by_condition"]
+    domains = {rec["scenario"]: rec["result"].get("domain") for rec in payload["records"]}
+    model_ids = meta.get("models", {})
+
+    with conn:
+        if existing is not None:
+            conn.execute("DELETE FROM runs WHERE run_id = ?", (existing["run_id"],))
+        cur = conn.execute(
+            "INSERT INTO runs (run_key, path, file_sha256, created_at, script, provider, alpha, seed,"
+            " max_tokens, trials, n_records, metadata_json, ingested_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                os.path.abspath(path),
+                digest,
+                meta.get("created_at"),
+                meta.get("script"),
+                meta.get("provider", "api"),
+                meta.get("alpha"),
+                meta.get("seed"),
+                meta.get("max_tokens"),
+                meta.get("trials"),
+                len(payload["records"]),
+                json.dumps(meta, ensure_ascii=False, sort_keys=True),
+                datetime.now().isoformat(),
+            ),
+        )
+        run_id = cur.lastrowid
+        conn.executemany(
+            "INSERT INTO run_models (run_id, model, model_id) VALUES (?, ?, ?)",
+            [(run_id, m, mid) for m, mid in model_ids.items()],
+        )
+        conn.executemany(
+            "INSERT INTO conditions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    run_id,
+                    c["scenario"],
+                    domains.get(c["scenario"]),
+                    c["model"],
+                    model_ids.get(c["model"]),
+                    float(c["temperature"]),
+                    c["n_trials"],
+                    c.get("avg_tokens_per_turn_mean"),
+                    c.get("avg_tokens_per_turn_std"),
+                    c.get("success_rate_mean"),
+                    c.get("success_rate_std"),
+                    c.get("trial_turn_consistency"),
+                    c.get("cached_input_tokens"),
+                    c.get("uncached_input_tokens"),
+                    c.get("cached_input_ratio"),
+                )
+                for c in by_condition
+            ],
+        )
+    return run_id, "replaced" if existing is not None else "added"
+
+
+def _run_filters(since: Optional[str], until: Optional[str]) -> Tuple[List[str], List[Any]]:
+    clauses: List[str] = []
+    params: List[Any] = []
+    if since:
+        clauses.append("r.created_at >= ?")
+        params.append(since)
+    if until:
+        clauses.append("r.created_at < ?")
+        params.append(until)
+    return clauses, params
+
+
+def _column(name: str) -> str:
+    return f"r.{name}" if name in RUN_COLUMNS else f"c.{name}"
+
+
+def list_runs(
+    conn: sqlite3.Connection, since: Optional[str] = None, until: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    clauses, params = _run_filters(since, until)
+    where = "WHERE " + " AND ".join(clauses) if clauses else ""
+    rows = conn.execute(
+        "SELECT run_id, created_at, path, provider, alpha, seed, trials, n_records,"
+        " (SELECT group_concat(model, ',') FROM run_models m WHERE m.run_id = r.run_id) AS models"
+        f" FROM runs r {where} ORDER BY created_at",
+        params,
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def query(
+    conn: sqlite3.Connection,
+    metric: str,
+    by: Sequence[str] = ("model",),
+    agg: str = "avg",
+    model: Optional[str] = None,
+    model_id: Optional[str] = None,
+    temperature: Optional[float] = None,
+    scenario: Optional[str] = None,
+    domain: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    provider: Optional[str] = None,
+    alpha: Optional[float] = None,
+    seed: Optional[int] = None,
+    include_local: bool = False,
+) -> List[Dict[str, Any]]:
+    """Aggregate one per-condition metric across catalogued runs.
+
+    ``since``/``until`` compare against the run's metadata `created_at` (ISO
+    strings, so a bare date like ``2026-02-01`` works). Runs made with the
+    offline `--provider local` stub are left out unless ``include_local`` is
+    set or ``provider="local"`` is asked for. Each row also reports how many
+    conditions and runs it covers.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric} (choose from {', '.join(METRICS)})")
+    if agg not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate: {agg} (choose from {', '.join(AGGREGATES)})")
+    unknown = [g for g in by if g not in GROUP_BY]
+    if unknown:
+        raise ValueError(f"Unknown group-by column(s): {unknown} (choose from {', '.join(GROUP_BY)})")
+
+    clauses, params = _run_filters(since, until)
+    for column, value in (
+        ("model", model),
+        ("model_id", model_id),
+        ("temperature", temperature),
+        ("scenario", scenario),
+        ("domain", domain),
+        ("provider", provider),
+        ("alpha", alpha),
+        ("seed", seed),
+    ):
+        if value is not None:
+            clauses.append(f"{_column(column)} = ?")
+            params.append(value)
+    if provider is None and not include_local:
+        clauses.append("r.provider != 'local'")
+    select = [_column(g) for g in by] + [
+        f"{agg.upper()}(c.{metric}) AS value",
+        f"COUNT(c.{metric}) AS n_conditions",
+        "COUNT(DISTINCT c.run_id) AS n_runs",
+    ]
+    sql = f"SELECT {', '.join(select)} FROM conditions c JOIN runs r ON r.run_id = c.run_id"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    if by:
+        group_cols = ", ".join(_column(g) for g in by)
+        sql += f" GROUP BY {group_cols} ORDER BY {group_cols}"
+    return [dict(r) for r in conn.execute(sql, params).fetchall()]
+
+
+def _print_rows(rows: Iterable[Dict[str, Any]]) -> None:
+    rows = list(rows)
+    if not rows:
+        print("(no rows)")
+        return
+    cols = list(rows[0])
+    cells = [[f"{r[c]:.4f}" if isinstance(r[c], float) else str(r[c]) for c in cols] for r in rows]
+    widths = [max(len(c), *(len(row[i]) for row in cells)) for i, c in enumerate(cols)]
+    print("  ".join(c.ljust(w) for c, w in zip(cols, widths)))
+    for row in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Indexed catalog of transfer results files.")
+    parser.add_argument("--db", help="Catalog database (default: $TRANSFER_CATALOG_DB or the cache dir)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_ingest = sub.add_parser("ingest", help="Add results files to the catalog")
+    p_ingest.add_argument("paths", nargs="+")
+
+    p_runs = sub.add_parser("runs", help="List catalogued runs")
+    p_runs.add_argument("--since", help="created_at lower bound (ISO date/time)")
+    p_runs.add_argument("--until", help="created_at upper bound, exclusive")
+
+    p_query = sub.add_parser("query", help="Aggregate a per-condition metric across runs")
+    p_query.add_argument("--metric", required=True, choices=METRICS)
+    p_query.add_argument("--by", default="model", help=f"Comma-separated: {', '.join(GROUP_BY)} (or 'none')")
+    p_query.add_argument("--agg", default="avg", choices=AGGREGATES)
+    p_query.add_argument("--model")
+    p_query.add_argument("--model-id")
+    p_query.add_argument("--temperature", type=float)
+    p_query.add_argument("--scenario")
+    p_query.add_argument("--domain")
+    p_query.add_argument("--provider", help="Only runs made with this --provider (e.g. api, local)")
+    p_query.add_argument("--alpha", type=float)
+    p_query.add_argument("--seed", type=int)
+    p_query.add_argument(
+        "--include-local", action="store_true", help="Also count --provider local stub runs (excluded by default)"
+    )
+    p_query.add_argument("--since", help="created_at lower bound (ISO date/time)")
+    p_query.add_argument("--until", help="created_at upper bound, exclusive")
+    p_query.add_argument("--json", metavar="PATH", help="Also write the rows as JSON")
+
+    a = parser.parse_args()
+    conn = connect(a.db)
+    try:
+        if a.cmd == "ingest":
+            for path in a.paths:
+                run_id, status = ingest(conn, path)
+                print(f"{path}: run {run_id} ({status})")
+        elif a.cmd == "runs":
+            _print_rows(list_runs(conn, a.since, a.until))
+        else:
+            by = [] if a.by == "none" else [x.strip() for x in a.by.split(",") if x.strip()]
+            rows = query(
+                conn, a.metric, by, a.agg, a.model, a.model_id, a.temperature,
+                a.scenario, a.domain, a.since, a.until, a.provider, a.alpha, a.seed, a.include_local,
+            )
+            _print_rows(rows)
+            if a.json:
+                save_json(a.json, {"metric": a.metric, "agg": a.agg, "by": by, "rows": rows})
+                print(f"Saved: {a.json}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
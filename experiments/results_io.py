@@ -0,0 +1,301 @@
+"""
+Results file I/O shared by the runner and the analysis tools.
+
+save_results writes the pretty JSON layout (the published run log), compact
+JSON or JSON lines, optionally gzip/zstd compressed and with raw responses in
+a content-addressed side file. load_results reads any of these back into one
+payload; iter_records streams records without loading the file. Readers only
+need this module, not the runner and its provider clients.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import os
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def save_json(path: str, payload: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+RESULT_FORMATS = ("json", "compact", "jsonl")
+RESULTS_JSONL_FORMAT = "nrr-transfer-results-jsonl"
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _compression_for(path: str) -> Optional[str]:
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def _zstandard() -> Any:
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError("zstd results need the 'zstandard' package (pip install zstandard).") from e
+    return zstandard
+
+
+def open_results_file(path: str, mode: str, compression: Optional[str] = None) -> IO[str]:
+    """Open a results file as text. On write, compression defaults to the
+    path suffix; on read it is detected from the magic bytes."""
+    if mode == "w":
+        compression = compression or _compression_for(path)
+    else:
+        with open(path, "rb") as f:
+            head = f.read(4)
+        compression = (
+            "gzip" if head.startswith(_GZIP_MAGIC) else "zstd" if head.startswith(_ZSTD_MAGIC) else None
+        )
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if compression == "zstd":
+        zstd = _zstandard()
+        raw = open(path, mode + "b")
+        if mode == "w":
+            stream = zstd.ZstdCompressor().stream_writer(raw, closefd=True)
+        else:
+            stream = zstd.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def responses_sidecar_path(path: str) -> str:
+    """`out.jsonl.gz` -> `out.responses.jsonl.gz` (same compression as the results)."""
+    compression = _compression_for(path)
+    base = path[: -len(".gz")] if compression == "gzip" else path[: -len(".zst")] if compression else path
+    base = os.path.splitext(base)[0]
+    return base + ".responses.jsonl" + {"gzip": ".gz", "zstd": ".zst"}.get(compression or "", "")
+
+
+def _split_responses(records: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """Copy records with each turn's response replaced by its sha256."""
+    responses: Dict[str, str] = {}
+    stripped = []
+    for rec in records:
+        turns = []
+        for t in rec["result"]["turns"]:
+            if "response" in t:
+                t = dict(t)
+                text = t.pop("response")
+                digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                responses.setdefault(digest, text)
+                t["response_sha256"] = digest
+            turns.append(t)
+        stripped.append({**rec, "result": {**rec["result"], "turns": turns}})
+    return stripped, responses
+
+
+def _write_lines(path: str, rows: Iterable[Dict[str, Any]]) -> None:
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open_results_file(tmp_path, "w", _compression_for(path)) as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def save_results(
+    path: str, payload: Dict[str, Any], fmt: str = "json", responses_sidecar: bool = False
+) -> List[str]:
+    """Write results as pretty JSON (`json`, the published layout), single-line
+    JSON (`compact`) or JSON lines (`jsonl`); a `.gz`/`.zst` suffix compresses.
+
+    With ``responses_sidecar`` the raw responses go to a content-addressed side
+    file (one line per distinct response) and turns keep `response_sha256`.
+    Returns the paths written.
+    """
+    if fmt not in RESULT_FORMATS:
+        raise ValueError(f"Unknown results format: {fmt}")
+    if fmt == "json" and not _compression_for(path) and not responses_sidecar:
+        save_json(path, payload)
+        return [path]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    written = [path]
+    records = payload["records"]
+    metadata = dict(payload["metadata"])
+    if responses_sidecar:
+        records, responses = _split_responses(records)
+        sidecar = responses_sidecar_path(path)
+        _write_lines(sidecar, ({"sha256": k, "response": v} for k, v in responses.items()))
+        metadata["responses_sidecar"] = os.path.basename(sidecar)
+        written.append(sidecar)
+
+    if fmt == "jsonl":
+        rows = itertools.chain(
+            [{"format": RESULTS_JSONL_FORMAT, "version": 1, "metadata": metadata}],
+            ({"record": rec} for rec in records),
+            [{"aggregation": payload.get("aggregation", {})}],
+        )
+        _write_lines(path, rows)
+        return written
+
+    body = {**payload, "metadata": metadata, "records": records}
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open_results_file(tmp_path, "w", _compression_for(path)) as f:
+        if fmt == "json":
+            json.dump(body, f, ensure_ascii=False, indent=2)
+        else:
+            json.dump(body, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return written
+
+
+def load_responses(path: str) -> Dict[str, str]:
+    with open_results_file(path, "r") as f:
+        return {row["sha256"]: row["response"] for row in map(json.loads, f)}
+
+
+def load_results(path: str, resolve_responses: bool = True) -> Dict[str, Any]:
+    """Read any layout written by save_results (or the original pretty JSON).
+
+    With ``resolve_responses`` responses stored in a side file are inlined
+    back into the turns, so callers see the same records as the JSON layout.
+    """
+    with open_results_file(path, "r") as f:
+        first = f.readline()
+        try:
+            head = json.loads(first)
+        except json.JSONDecodeError:
+            head = None
+        if isinstance(head, dict) and head.get("format") == RESULTS_JSONL_FORMAT:
+            payload: Dict[str, Any] = {"metadata": head["metadata"], "records": [], "aggregation": {}}
+            for line in f:
+                row = json.loads(line)
+                if "record" in row:
+                    payload["records"].append(row["record"])
+                elif "aggregation" in row:
+                    payload["aggregation"] = row["aggregation"]
+        elif head is not None:
+            payload = head
+        else:
+            payload = json.loads(first + f.read())
+
+    sidecar = payload.get("metadata", {}).get("responses_sidecar")
+    if sidecar and resolve_responses:
+        responses = load_responses(os.path.join(os.path.dirname(path), sidecar))
+        for rec in payload["records"]:
+            for t in rec["result"]["turns"]:
+                if "response_sha256" in t:
+                    t["response"] = responses[t.pop("response_sha256")]
+    return payload
+
+
+class _JsonReader:
+    """Incremental JSON value reader over a text stream (bounded buffer)."""
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, f: IO[str], chunk: int = 1 << 16) -> None:
+        self.f = f
+        self.chunk = chunk
+        self.buf = ""
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        # Read at least as much as is buffered so a large value costs linear time.
+        data = self.f.read(max(self.chunk, len(self.buf) - self.pos))
+        if not data:
+            return False
+        self.buf = self.buf[self.pos :] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos : self.pos + 1]
+
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise ValueError(f"Expected {ch!r} in results JSON, got {self.peek()!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            if end == len(self.buf) and self._fill():
+                continue  # a number may continue in the next chunk
+            self.pos = end
+            return obj
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield the records of a results file one at a time, in any save_results
+    layout, without holding the whole file in memory.
+
+    Responses kept in a side file are not resolved (turns keep `response_sha256`).
+    """
+    jsonl_head = json.dumps({"format": RESULTS_JSONL_FORMAT}, separators=(",", ":"))[:-1]
+    with open_results_file(path, "r") as f:
+        is_jsonl = f.read(len(jsonl_head)) == jsonl_head
+    with open_results_file(path, "r") as f:
+        if is_jsonl:
+            for line in f:
+                if line.startswith('{"record":'):
+                    yield json.loads(line)["record"]
+            return
+        reader = _JsonReader(f)
+        reader.expect("{")
+        while reader.peek() != "}":
+            key = reader.value()
+            reader.expect(":")
+            if key != "records":
+                reader.value()
+            else:
+                reader.expect("[")
+                while reader.peek() != "]":
+                    yield reader.value()
+                    if reader.peek() == ",":
+                        reader.pos += 1
+                reader.expect("]")
+            if reader.peek() == ",":
+                reader.pos += 1
+
+
+def write_checksums(paths: List[str], out_path: str) -> None:
+    """Update `sha256  basename` lines in the format of data/results/checksums_sha256.txt.
+
+    Lines for ``paths`` are replaced or appended; lines for other files are kept.
+    """
+    entries: Dict[str, str] = {}
+    if os.path.exists(out_path):
+        with open(out_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if line.strip():
+                    entries[line.split("  ", 1)[-1]] = line
+    for p in sorted(paths):
+        entries[os.path.basename(p)] = f"{file_sha256(p)}  {os.path.basename(p)}"
+    tmp_path = f"{out_path}.tmp{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(entries.values()) + "\n")
+    os.replace(tmp_path, out_path)
@@ -12,6 +12,9 @@ Scenarios are loaded from an existing notebook that defines SCENARIOS[...] dicts
 from __future__ import annotations
 
 import argparse
+import contextlib
+import cProfile
+import hashlib
 import json
 import math
 import os
@@ -19,10 +22,27 @@ import random
 import re
 import statistics
 import sys
+import threading
 import time
+import tracemalloc
+import zlib
+from bisect import bisect_left, insort
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from endpoint_clients import EndpointClients, endpoint_summary, load_endpoints
+from results_io import (
+    RESULT_FORMATS,
+    file_sha256,
+    iter_records,
+    load_results,
+    save_json,
+    save_results,
+    write_checksums,
+)
+from transfer_metrics import MetricsServer, RunMetrics
 
 
 TRANSFER_SCENARIOS = [
@@ -57,7 +77,9 @@ MODEL_IDS = {
 class RunConfig:
     notebook_path: Optional[str]
     scenarios_json: Optional[str]
+    scenarios_pack: Optional[str]
     out_json: str
+    scenario_keys: Optional[List[str]]
     trials: int
     temperatures: List[float]
     models: List[str]
@@ -66,6 +88,103 @@ class RunConfig:
     seed: int
     sleep_sec: float
     retry: int
+    prompt_cache: bool
+    top_k: int
+    explore: int
+    provider: str
+    out_format: str
+    responses_sidecar: bool
+    checksums: bool
+    endpoints: Dict[str, Dict[str, Any]]
+    endpoint_max_connections: int
+    workers: int
+    coalesce: bool
+    token_budget: Optional[int]
+    deadline: Optional[float]
+    cost_from: List[str]
+    diff_against: Optional[str]
+    diff_dry_run: bool
+    metrics_port: Optional[int]
+    metrics_host: str
+    profile: bool
+    profile_cprofile: Optional[str]
+    profile_memory: Optional[str]
+
+
+class StageTimer:
+    """Accumulated wall-clock time per named stage; a no-op when disabled."""
+
+    def __init__(self, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.totals: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _timed(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.totals[name] = self.totals.get(name, 0.0) + elapsed
+                self.counts[name] = self.counts.get(name, 0) + 1
+
+    def stage(self, name: str) -> Any:
+        return self._timed(name) if self.enabled else contextlib.nullcontext()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                name: {
+                    "total_s": round(total, 6),
+                    "count": self.counts[name],
+                    "mean_ms": round(1000.0 * total / self.counts[name], 4),
+                }
+                for name, total in self.totals.items()
+            }
+
+
+class RunProfiler:
+    """--profile support: stage timers plus optional cProfile and tracemalloc output."""
+
+    def __init__(
+        self, enabled: bool, cprofile_path: Optional[str] = None, memory_path: Optional[str] = None
+    ) -> None:
+        self.enabled = enabled or bool(cprofile_path) or bool(memory_path)
+        self.timer = StageTimer(self.enabled)
+        self.cprofile_path = cprofile_path
+        self.memory_path = memory_path
+        self.peak_memory_bytes: Optional[int] = None
+        self._profile: Optional[cProfile.Profile] = None
+
+    def start(self) -> None:
+        if self.memory_path:
+            tracemalloc.start()
+        if self.cprofile_path:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self) -> None:
+        if self._profile is not None:
+            self._profile.disable()
+            os.makedirs(os.path.dirname(self.cprofile_path) or ".", exist_ok=True)
+            self._profile.dump_stats(self.cprofile_path)
+            self._profile = None
+        if self.memory_path and tracemalloc.is_tracing():
+            self.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+            os.makedirs(os.path.dirname(self.memory_path) or ".", exist_ok=True)
+            tracemalloc.take_snapshot().dump(self.memory_path)
+            tracemalloc.stop()
+
+    def summary(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"stages": self.timer.summary()}
+        if self.cprofile_path:
+            out["cprofile"] = self.cprofile_path
+        if self.memory_path:
+            out["tracemalloc"] = {"snapshot": self.memory_path, "peak_bytes": self.peak_memory_bytes}
+        return out
 
 
 class StateManager:
@@ -112,7 +231,132 @@ class StateManager:
         return self.create_state(items)
 
 
-def load_scenarios_from_notebook(path: str) -> Dict[str, Dict[str, Any]]:
+def _partials_add(partials: List[float], x: float) -> None:
+    """Add ``x`` to an exact running float sum (Shewchuk partials, as in math.fsum)."""
+    i = 0
+    for y in partials:
+        if abs(x) < abs(y):
+            x, y = y, x
+        hi = x + y
+        lo = y - (hi - x)
+        if lo:
+            partials[i] = lo
+            i += 1
+        x = hi
+    partials[i:] = [x]
+
+
+class SparseStateManager:
+    """In-place state for large candidate sets (top-k prompt windowing).
+
+    Weights are stored unnormalized together with an exact running total, so
+    an operator only rewrites the target entry and its slot in the weight
+    order; normalization happens lazily when weights are read. Weights are
+    rebased onto the total only when it drifts out of float range.
+    """
+
+    _TOTAL_LIMITS = (1e-150, 1e150)
+
+    def __init__(self) -> None:
+        self.weights: Dict[str, Dict[str, float]] = {}
+        self.partials: Dict[str, List[float]] = {}
+        self.orders: Dict[str, List[Tuple[float, str]]] = {}
+        self.counter = 0
+
+    def create_state(self, items: Dict[str, float]) -> str:
+        state_id = f"S{self.counter:04d}"
+        total = sum(items.values())
+        if total <= 0:
+            raise ValueError("State total must be > 0")
+        self.weights[state_id] = {k: float(v) for k, v in items.items()}
+        self._rebuild(state_id)
+        self.counter += 1
+        return state_id
+
+    def _rebuild(self, state_id: str) -> None:
+        weights = self.weights[state_id]
+        partials: List[float] = []
+        for w in weights.values():
+            _partials_add(partials, w)
+        self.partials[state_id] = partials
+        self.orders[state_id] = sorted((-w, k) for k, w in weights.items())
+
+    def total(self, state_id: str) -> float:
+        return math.fsum(self.partials[state_id])
+
+    def get_state(self, state_id: str) -> Dict[str, Dict[str, float]]:
+        total = self.total(state_id)
+        return {"items": {k: w / total for k, w in self.weights[state_id].items()}}
+
+    def weight(self, state_id: str, item: str) -> float:
+        return self.weights[state_id][item] / self.total(state_id)
+
+    def window(
+        self, state_id: str, top_k: int, explore: int = 0, rng: Optional[random.Random] = None
+    ) -> List[str]:
+        """Top-k items by weight, plus ``explore`` items sampled from the rest."""
+        order = self.orders[state_id]
+        shown = [k for _, k in order[:top_k]]
+        rest = len(order) - len(shown)
+        if explore > 0 and rest > 0:
+            picks = (rng or random).sample(range(len(shown), len(order)), min(explore, rest))
+            shown.extend(order[i][1] for i in sorted(picks))
+        return shown
+
+    def apply_operator(
+        self, state_id: str, operator: str, target: str, strength: float = 0.4
+    ) -> str:
+        weights = self.weights[state_id]
+        if target not in weights:
+            return state_id
+        partials = self.partials[state_id]
+        w_old = weights[target]
+        old = w_old / math.fsum(partials)
+
+        if operator in ("σ", "sigma"):
+            new = min(0.95, old + strength)
+        elif operator in ("δ", "delta"):
+            new = max(0.05, old - strength)
+        else:
+            return state_id
+
+        _partials_add(partials, -w_old)
+        others = math.fsum(partials)
+        if others <= 0:
+            # No other mass to rescale: renormalizing restores the target to 1.
+            _partials_add(partials, w_old)
+            return state_id
+
+        # Choosing the target's raw weight so it holds `new` of the total leaves
+        # every other item rescaled by (1 - new) / (1 - old), as StateManager does.
+        w_new = new * others / (1.0 - new)
+        _partials_add(partials, w_new)
+        weights[target] = w_new
+        order = self.orders[state_id]
+        del order[bisect_left(order, (-w_old, target))]
+        insort(order, (-w_new, target))
+
+        lo, hi = self._TOTAL_LIMITS
+        total = others + w_new
+        if not lo < total < hi:
+            for k in weights:
+                weights[k] /= total
+            self._rebuild(state_id)
+        return state_id
+
+
+SCENARIO_PACK_FORMAT = "nrr-transfer-scenario-pack"
+SCENARIO_PACK_VERSION = 1
+OPERATORS = ("sigma", "delta")
+
+
+def default_cache_dir() -> str:
+    return os.getenv("TRANSFER_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "nrr-transfer"
+    )
+
+
+def _extract_notebook_scenarios(path: str) -> Dict[str, Dict[str, Any]]:
     with open(path, "r", encoding="utf-8") as f:
         nb = json.load(f)
 
@@ -133,7 +377,155 @@ def load_scenarios_from_notebook(path: str) -> Dict[str, Dict[str, Any]]:
 
     if "SCENARIOS" not in env:
         raise ValueError("SCENARIOS not found after executing notebook blocks.")
-    return env["SCENARIOS"]
+    # Round-trip through JSON (tuples -> lists) so a fresh extraction matches the cached copy.
+    return json.loads(json.dumps(env["SCENARIOS"], ensure_ascii=False))
+
+
+def load_scenarios_from_notebook(
+    path: str, cache_dir: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Extract SCENARIOS from a notebook, cached by the notebook's sha256.
+
+    Notebook cells are only executed on a cache miss; pass ``cache_dir=""``
+    to always re-extract.
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    if not cache_dir:
+        return _extract_notebook_scenarios(path)
+
+    cache_path = os.path.join(cache_dir, f"notebook-scenarios-{file_sha256(path)}.json")
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    scenarios = _extract_notebook_scenarios(path)
+    tmp_path = f"{cache_path}.tmp{os.getpid()}"
+    save_json(tmp_path, scenarios)
+    os.replace(tmp_path, cache_path)
+    return scenarios
+
+
+def validate_scenarios(scenarios: Dict[str, Any]) -> List[str]:
+    """Return schema problems (empty when every scenario is runnable)."""
+    errors: List[str] = []
+    for key, sc in scenarios.items():
+        if not isinstance(sc, dict):
+            errors.append(f"{key}: scenario must be an object")
+            continue
+        if sc.get("domain") not in DOMAIN_PROMPTS:
+            errors.append(f"{key}: unknown domain {sc.get('domain')!r}")
+
+        state = sc.get("initial_state")
+        if not isinstance(state, dict) or not state:
+            errors.append(f"{key}: initial_state must be a non-empty object")
+            state = {}
+        for item, w in state.items():
+            if isinstance(w, bool) or not isinstance(w, (int, float)) or not w > 0:
+                errors.append(f"{key}: initial_state[{item!r}] must be a positive number")
+
+        turns = sc.get("turns")
+        if not isinstance(turns, list) or not turns:
+            errors.append(f"{key}: turns must be a non-empty list")
+            continue
+        for i, turn in enumerate(turns, start=1):
+            if not isinstance(turn, dict) or not parse_turn_text(turn):
+                errors.append(f"{key}: turn {i} has no text/query/situation")
+                continue
+            expected = turn.get("expected")
+            if expected is None:
+                continue
+            if not (isinstance(expected, (list, tuple)) and len(expected) == 2):
+                errors.append(f"{key}: turn {i} expected must be [operator, target]")
+            elif expected[0] not in OPERATORS:
+                errors.append(f"{key}: turn {i} expected operator {expected[0]!r} is not sigma/delta")
+            elif expected[1] not in state:
+                errors.append(f"{key}: turn {i} expected target {expected[1]!r} is not in initial_state")
+    return errors
+
+
+def write_scenario_pack(
+    path: str, scenarios: Dict[str, Dict[str, Any]], source: str, source_sha256: str
+) -> Dict[str, Any]:
+    """Validate and write a compact, hashed scenario pack.
+
+    Line 1 is a JSON header, line 2 the compact body. Item names are interned
+    into one table and referenced by index; turn text is normalized to "text".
+    """
+    errors = validate_scenarios(scenarios)
+    if errors:
+        raise ValueError("Invalid scenarios:\n- " + "\n- ".join(errors))
+
+    item_index: Dict[str, int] = {}
+    packed: Dict[str, Any] = {}
+    for key, sc in scenarios.items():
+        meta = {k: v for k, v in sc.items() if k not in ("initial_state", "turns")}
+        state = [[item_index.setdefault(k, len(item_index)), w] for k, w in sc["initial_state"].items()]
+        turns = []
+        for turn in sc["turns"]:
+            expected = turn.get("expected")
+            if expected:
+                turns.append([parse_turn_text(turn), expected[0], item_index[expected[1]]])
+            else:
+                turns.append([parse_turn_text(turn)])
+        packed[key] = {"meta": meta, "state": state, "turns": turns}
+
+    body = json.dumps(
+        {"items": list(item_index), "scenarios": packed},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    header = {
+        "format": SCENARIO_PACK_FORMAT,
+        "version": SCENARIO_PACK_VERSION,
+        "source": source,
+        "source_sha256": source_sha256,
+        "body_sha256": hashlib.sha256(body).hexdigest(),
+        "scenario_count": len(packed),
+        "item_count": len(item_index),
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n" + body + b"\n")
+    return header
+
+
+def load_scenario_pack(path: str) -> Dict[str, Dict[str, Any]]:
+    """Load a pack written by write_scenario_pack; callers skip validate_scenarios.
+
+    The pack records the basename of its source. When that file sits next to
+    the pack and no longer hashes to source_sha256, the pack is stale and
+    loading fails rather than running outdated scenarios.
+    """
+    with open(path, "rb") as f:
+        header = json.loads(f.readline())
+        body = f.readline().rstrip(b"\n")
+    if header.get("format") != SCENARIO_PACK_FORMAT or header.get("version") != SCENARIO_PACK_VERSION:
+        raise ValueError(f"Not a v{SCENARIO_PACK_VERSION} scenario pack: {path}")
+    if hashlib.sha256(body).hexdigest() != header["body_sha256"]:
+        raise ValueError(f"Scenario pack body hash mismatch: {path}")
+    source = os.path.join(os.path.dirname(path), header.get("source") or "")
+    if header.get("source") and os.path.isfile(source) and file_sha256(source) != header["source_sha256"]:
+        raise ValueError(
+            f"Scenario pack {path} is stale: {source} changed since it was compiled. "
+            "Re-run experiments/compile_scenarios.py."
+        )
+
+    data = json.loads(body)
+    items = [sys.intern(name) for name in data["items"]]
+    scenarios: Dict[str, Dict[str, Any]] = {}
+    for key, sc in data["scenarios"].items():
+        scenario = dict(sc["meta"])
+        scenario["initial_state"] = {items[i]: w for i, w in sc["state"]}
+        turns = []
+        for t in sc["turns"]:
+            turn: Dict[str, Any] = {"text": t[0]}
+            if len(t) == 3:
+                turn["expected"] = [t[1], items[t[2]]]
+            turns.append(turn)
+        scenario["turns"] = turns
+        scenarios[key] = scenario
+    return scenarios
 
 
 def extract_operator(response_text: str, valid_targets: List[str]) -> Tuple[Optional[str], Optional[str]]:
@@ -156,74 +548,171 @@ def extract_operator(response_text: str, valid_targets: List[str]) -> Tuple[Opti
     return operator, target
 
 
-def make_prompt(domain: str, items: List[str], turn_text: str) -> str:
-    items_str = ", ".join(items)
-    if domain == "IME":
-        return f"""State has: [{items_str}]
-New: "{turn_text}"
-
-Choose operator and target:
+DOMAIN_PROMPTS: Dict[str, Tuple[str, str, str]] = {
+    "IME": (
+        "State has",
+        "New",
+        """Choose operator and target:
 - sigma: strengthen matching interpretation
 - delta: weaken non-matching interpretation
 
 Output ONLY:
 operator: <sigma or delta>
-target: <one of the items>"""
-    if domain == "RAG":
-        return f"""Documents: [{items_str}]
-User query: "{turn_text}"
-
-Which document is most relevant?
+target: <one of the items>""",
+    ),
+    "RAG": (
+        "Documents",
+        "User query",
+        """Which document is most relevant?
 
 Output ONLY:
 operator: <sigma or delta>
 target: <document key>
 
-sigma = increase relevance, delta = decrease relevance"""
-    if domain == "Agent":
-        return f"""Tasks: [{items_str}]
-Situation: "{turn_text}"
-
-Which task should be prioritized or deprioritized?
+sigma = increase relevance, delta = decrease relevance""",
+    ),
+    "Agent": (
+        "Tasks",
+        "Situation",
+        """Which task should be prioritized or deprioritized?
 
 Output ONLY:
 operator: <sigma or delta>
-target: <task key>"""
-    if domain == "Planning":
-        return f"""Project tasks: [{items_str}]
-New information: "{turn_text}"
-
-Which task should be adjusted?
+target: <task key>""",
+    ),
+    "Planning": (
+        "Project tasks",
+        "New information",
+        """Which task should be adjusted?
 
 Output ONLY:
 operator: <sigma or delta>
-target: <task key>"""
-    if domain == "Multi-agent":
-        return f"""Expert perspectives: [{items_str}]
-New information: "{turn_text}"
-
-Which expert is most relevant?
+target: <task key>""",
+    ),
+    "Multi-agent": (
+        "Expert perspectives",
+        "New information",
+        """Which expert is most relevant?
 
 Output ONLY:
 operator: <sigma or delta>
-target: <expert key>"""
-    if domain == "Multimodal":
-        return f"""Design candidates: [{items_str}]
-New information: "{turn_text}"
-
-Which design should be adjusted?
+target: <expert key>""",
+    ),
+    "Multimodal": (
+        "Design candidates",
+        "New information",
+        """Which design should be adjusted?
 
 Output ONLY:
 operator: <sigma or delta>
-target: <design key>"""
-    raise ValueError(f"Unknown domain: {domain}")
+target: <design key>""",
+    ),
+}
+
+
+def _domain_prompt(domain: str) -> Tuple[str, str, str]:
+    if domain not in DOMAIN_PROMPTS:
+        raise ValueError(f"Unknown domain: {domain}")
+    return DOMAIN_PROMPTS[domain]
+
+
+def make_prompt(domain: str, items: List[str], turn_text: str) -> str:
+    """Protocol prompt: item list, then the turn text, then the instructions."""
+    items_label, turn_label, instructions = _domain_prompt(domain)
+    items_str = ", ".join(items)
+    return f"""{items_label}: [{items_str}]
+{turn_label}: "{turn_text}"
+
+{instructions}"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Provider-independent token estimate (about 4 bytes of UTF-8 per token)."""
+    return max(1, math.ceil(len(text.encode("utf-8")) / 4))
+
+
+def make_prompt_parts(domain: str, items: List[str], turn_text: str) -> Tuple[str, str]:
+    """Cache-friendly layout: (stable per-scenario prefix, per-turn suffix).
+
+    The prefix holds the item list and instructions, which do not change while
+    the item set is fixed, so providers can serve it from their prompt cache.
+    """
+    items_label, turn_label, instructions = _domain_prompt(domain)
+    items_str = ", ".join(items)
+    prefix = f"""{items_label}: [{items_str}]
+
+{instructions}
+
+"""
+    return prefix, f'{turn_label}: "{turn_text}"'
+
+
+def task_fingerprint(
+    scenario: Dict[str, Any],
+    model_id: str,
+    temperature: float,
+    max_tokens: int,
+    alpha: float,
+    prompt_cache: bool = False,
+    top_k: int = 0,
+    explore: int = 0,
+    provider: str = "api",
+    base_url: Optional[str] = None,
+) -> str:
+    """Hash of every input that determines a task's provider calls and state updates.
+
+    The prompt template is rendered with placeholder items and turn text in the
+    layout the run uses, so edits to make_prompt/make_prompt_parts change it.
+    ``base_url`` is set for --endpoints-json models.
+    """
+    if prompt_cache:
+        template: Any = list(make_prompt_parts(scenario["domain"], ["{items}"], "{turn}"))
+    else:
+        template = make_prompt(scenario["domain"], ["{items}"], "{turn}")
+    spec = {
+        "scenario": scenario,
+        "prompt_template": template,
+        "top_k": top_k,
+        "explore": explore,
+        "provider": provider,
+        "base_url": base_url,
+        "model_id": model_id,
+        "temperature": float(temperature),
+        "max_tokens": max_tokens,
+        "alpha": float(alpha),
+    }
+    blob = json.dumps(spec, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def record_key(rec: Dict[str, Any]) -> Tuple[str, float, int, str]:
+    return (rec["model"], float(rec["temperature"]), int(rec["trial"]), rec["scenario"])
 
 
 class LLMClients:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        endpoints: Optional[Dict[str, Dict[str, Any]]] = None,
+        endpoint_max_connections: int = 32,
+    ) -> None:
         self._claude = None
         self._openai = None
         self._gemini = None
+        self._endpoints = endpoints or {}
+        self._endpoint_max_connections = endpoint_max_connections
+        self._endpoint_clients: Optional[EndpointClients] = None
+        self._endpoint_lock = threading.Lock()
+
+    def _ensure_endpoint_clients(self) -> EndpointClients:
+        with self._endpoint_lock:
+            if self._endpoint_clients is None:
+                self._endpoint_clients = EndpointClients(self._endpoints, self._endpoint_max_connections)
+            return self._endpoint_clients
+
+    def close(self) -> None:
+        if self._endpoint_clients is not None:
+            self._endpoint_clients.close()
+            self._endpoint_clients = None
 
     def _ensure_clients(self) -> None:
         if self._claude is None:
@@ -250,51 +739,196 @@ class LLMClients:
         prompt: str,
         temperature: float,
         max_tokens: int,
-    ) -> Tuple[str, int, int, int]:
+        cache_prefix: str = "",
+    ) -> Tuple[str, int, int, int, int]:
+        """Return (text, total, input, output, cached_input) token usage.
+
+        ``input`` always counts the whole prompt; ``cached_input`` is the part
+        served from the provider's prompt cache. A non-empty ``cache_prefix``
+        is sent ahead of ``prompt`` and marked cacheable where the API allows.
+        """
+        if model in self._endpoints:
+            return self._ensure_endpoint_clients().call(
+                model, model_id, prompt, temperature, max_tokens, cache_prefix
+            )
         self._ensure_clients()
+        full_prompt = cache_prefix + prompt
 
         if model == "claude":
+            if cache_prefix:
+                content: Any = [
+                    {"type": "text", "text": cache_prefix, "cache_control": {"type": "ephemeral"}},
+                    {"type": "text", "text": prompt},
+                ]
+            else:
+                content = prompt
             msg = self._claude.messages.create(
                 model=model_id,
                 max_tokens=max_tokens,
                 temperature=temperature,
-                messages=[{"role": "user", "content": prompt}],
+                messages=[{"role": "user", "content": content}],
             )
             text = msg.content[0].text
-            inp = msg.usage.input_tokens
+            cached = int(getattr(msg.usage, "cache_read_input_tokens", 0) or 0)
+            written = int(getattr(msg.usage, "cache_creation_input_tokens", 0) or 0)
+            inp = msg.usage.input_tokens + cached + written
             out = msg.usage.output_tokens
-            return text, inp + out, inp, out
+            return text, inp + out, inp, out, cached
 
         if model == "gpt":
+            # OpenAI caches long shared prefixes automatically; no marker needed.
             res = self._openai.chat.completions.create(
                 model=model_id,
-                messages=[{"role": "user", "content": prompt}],
+                messages=[{"role": "user", "content": full_prompt}],
                 max_tokens=max_tokens,
                 temperature=temperature,
             )
             text = res.choices[0].message.content or ""
             inp = res.usage.prompt_tokens
             out = res.usage.completion_tokens
-            return text, inp + out, inp, out
+            details = getattr(res.usage, "prompt_tokens_details", None)
+            cached = int(getattr(details, "cached_tokens", 0) or 0)
+            return text, inp + out, inp, out, cached
 
         if model == "gemini":
             gm = self._gemini.GenerativeModel(
                 model_name=model_id,
                 generation_config={"max_output_tokens": max_tokens, "temperature": temperature},
             )
-            res = gm.generate_content(prompt)
+            res = gm.generate_content(full_prompt)
             text = res.text
             usage = getattr(res, "usage_metadata", None)
             if usage:
                 inp = int(getattr(usage, "prompt_token_count", 0) or 0)
                 out = int(getattr(usage, "candidates_token_count", 0) or 0)
+                cached = int(getattr(usage, "cached_content_token_count", 0) or 0)
             else:
-                inp, out = 0, 0
-            return text, inp + out, inp, out
+                inp, out, cached = 0, 0, 0
+            return text, inp + out, inp, out, cached
 
         raise ValueError(f"Unknown model: {model}")
 
 
+class LocalClients:
+    """Zero-latency offline provider for benchmarks and stress runs.
+
+    Picks the operator and one listed item from a hash of the prompt, so
+    identical prompts always get identical answers. Token counts are
+    estimate_tokens() values.
+    """
+
+    _ITEMS_RE = re.compile(r": \[([^\]]*)\]")
+
+    def call(
+        self,
+        model: str,
+        model_id: str,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> Tuple[str, int, int, int, int]:
+        full_prompt = cache_prefix + prompt
+        m = self._ITEMS_RE.search(full_prompt)
+        items = m.group(1).split(", ") if m and m.group(1) else [""]
+        h = zlib.crc32(full_prompt.encode("utf-8"))
+        text = f"operator: {OPERATORS[h & 1]}\ntarget: {items[(h >> 1) % len(items)]}"
+        inp = estimate_tokens(full_prompt)
+        out = estimate_tokens(text)
+        return text, inp + out, inp, out, 0
+
+
+class CoalescingClients:
+    """Share one provider request among identical concurrent calls.
+
+    Calls coalesce only when they carry the same explicit ``scope`` and the
+    same (model_id, prompt, cache_prefix, temperature, max_tokens), and only at
+    temperature 0.0; anything else goes straight to the wrapped client. Entries
+    live only while the request is in flight, so this is not a response cache.
+    Use ``scoped(scope)`` to get a client that run_one_scenario can call.
+    """
+
+    def __init__(self, inner: Any) -> None:
+        self.inner = inner
+        self.provider_calls = 0
+        self.coalesced_calls = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[Tuple[Any, ...], Future] = {}
+
+    def scoped(self, scope: Optional[Tuple[Any, ...]]) -> "ScopedClients":
+        return ScopedClients(self, scope)
+
+    def call(
+        self,
+        model: str,
+        model_id: str,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        cache_prefix: str = "",
+        scope: Optional[Tuple[Any, ...]] = None,
+    ) -> Tuple[str, int, int, int, int]:
+        args = (model, model_id, prompt, temperature, max_tokens, cache_prefix)
+        if scope is None or temperature != 0.0:
+            with self._lock:
+                self.provider_calls += 1
+            return self.inner.call(*args)
+
+        key = (scope, model_id, prompt, cache_prefix, temperature, max_tokens)
+        with self._lock:
+            fut = self._inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+                self.provider_calls += 1
+            else:
+                self.coalesced_calls += 1
+        if not leader:
+            return fut.result()
+        try:
+            fut.set_result(self.inner.call(*args))
+        except Exception as e:
+            fut.set_exception(e)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+        return fut.result()
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            return {"provider_calls": self.provider_calls, "coalesced_calls": self.coalesced_calls}
+
+
+class ScopedClients:
+    def __init__(self, coalescer: CoalescingClients, scope: Optional[Tuple[Any, ...]]) -> None:
+        self.coalescer = coalescer
+        self.scope = scope
+
+    def call(
+        self,
+        model: str,
+        model_id: str,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        cache_prefix: str = "",
+    ) -> Tuple[str, int, int, int, int]:
+        return self.coalescer.call(
+            model, model_id, prompt, temperature, max_tokens, cache_prefix, scope=self.scope
+        )
+
+
+def coalesce_scope(scenario_key: str, model: str, temperature: float, trial: int) -> Tuple[Any, ...]:
+    """Trials of one condition share a scope at temperature 0.0 only.
+
+    At temperature > 0 each trial is an independent sample, so the trial index
+    is part of the scope and identical prompts are never merged across trials.
+    """
+    if temperature == 0.0:
+        return (scenario_key, model, temperature)
+    return (scenario_key, model, temperature, trial)
+
+
 def parse_turn_text(turn: Dict[str, Any]) -> str:
     return turn.get("text", turn.get("query", turn.get("situation", "")))
 
@@ -309,9 +943,17 @@ def run_one_scenario(
     alpha: float,
     retry: int,
     sleep_sec: float,
+    prompt_cache: bool = False,
+    top_k: int = 0,
+    explore: int = 0,
+    timer: Optional[StageTimer] = None,
+    metrics: Optional[RunMetrics] = None,
 ) -> Dict[str, Any]:
-    mgr = StateManager()
+    timer = timer or StageTimer()
+    windowed = top_k > 0
+    mgr: Any = SparseStateManager() if windowed else StateManager()
     state_id = mgr.create_state(scenario["initial_state"])
+    rng = random.Random(f"{scenario_key}|{model}|{temperature}")
     domain = scenario["domain"]
 
     result: Dict[str, Any] = {
@@ -325,39 +967,69 @@ def run_one_scenario(
         "total_tokens": 0,
         "sigma_count": 0,
         "delta_count": 0,
+        "cached_input_tokens": 0,
+        "uncached_input_tokens": 0,
     }
+    if windowed:
+        result["item_window"] = {
+            "top_k": top_k,
+            "explore": explore,
+            "n_items": len(scenario["initial_state"]),
+        }
 
     for turn_idx, turn in enumerate(scenario["turns"], start=1):
         text = parse_turn_text(turn)
-        items = list(mgr.get_state(state_id)["items"].keys())
-        prompt = make_prompt(domain, items, text)
+        with timer.stage("prompt_build"):
+            if windowed:
+                items = mgr.window(state_id, top_k, explore, rng)
+            else:
+                items = list(mgr.get_state(state_id)["items"].keys())
+            if prompt_cache:
+                cache_prefix, prompt = make_prompt_parts(domain, items, text)
+            else:
+                cache_prefix, prompt = "", make_prompt(domain, items, text)
 
         last_err = None
         response_text = ""
-        total = inp = out = 0
-        for _ in range(retry):
+        total = inp = out = cached = 0
+        for attempt in range(retry):
+            if metrics is not None:
+                if attempt:
+                    metrics.retry(model)
+                metrics.call_started(model)
+            call_start = time.perf_counter()
             try:
-                response_text, total, inp, out = clients.call(
-                    model=model,
-                    model_id=MODEL_IDS[model],
-                    prompt=prompt,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                )
+                with timer.stage("provider_call"):
+                    response_text, total, inp, out, cached = clients.call(
+                        model=model,
+                        model_id=MODEL_IDS[model],
+                        prompt=prompt,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        cache_prefix=cache_prefix,
+                    )
                 last_err = None
-                break
             except Exception as e:  # API/network/limits
                 last_err = str(e)
-                time.sleep(1.5)
+            if metrics is not None:
+                metrics.call_finished(model, time.perf_counter() - call_start, last_err is None)
+            if last_err is None:
+                break
+            time.sleep(1.5)
 
         if last_err is not None:
             result["turns"].append({"turn": turn_idx, "error": last_err, "success": False})
             continue
 
-        op, target = extract_operator(response_text, items)
+        with timer.stage("extraction"):
+            op, target = extract_operator(response_text, items)
         success = op is not None and target is not None
+        if metrics is not None:
+            metrics.add_tokens(model, inp, out, cached)
+            metrics.extraction(model, success)
         if success:
-            state_id = mgr.apply_operator(state_id, op, target, strength=alpha)
+            with timer.stage("state_update"):
+                state_id = mgr.apply_operator(state_id, op, target, strength=alpha)
             if op == "sigma":
                 result["sigma_count"] += 1
             elif op == "delta":
@@ -370,6 +1042,8 @@ def run_one_scenario(
                 "total_tokens": total,
                 "input_tokens": inp,
                 "output_tokens": out,
+                "cached_input_tokens": cached,
+                "uncached_input_tokens": inp - cached,
                 "operator": op,
                 "target": target,
                 "success": success,
@@ -377,6 +1051,8 @@ def run_one_scenario(
             }
         )
         result["total_tokens"] += total
+        result["cached_input_tokens"] += cached
+        result["uncached_input_tokens"] += inp - cached
         time.sleep(sleep_sec)
 
     n_turns = len(scenario["turns"])
@@ -393,6 +1069,25 @@ def _safe_std(values: List[float]) -> float:
     return statistics.pstdev(values)
 
 
+def _input_token_split(turns: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """(cached, uncached) input tokens; legacy turns count as fully uncached."""
+    cached = uncached = 0
+    for t in turns:
+        c = int(t.get("cached_input_tokens", 0) or 0)
+        cached += c
+        uncached += int(t.get("uncached_input_tokens", (t.get("input_tokens", 0) or 0) - c))
+    return cached, uncached
+
+
+def _cache_summary(cached: int, uncached: int) -> Dict[str, Any]:
+    total = cached + uncached
+    return {
+        "cached_input_tokens": cached,
+        "uncached_input_tokens": uncached,
+        "cached_input_ratio": round(cached / total, 4) if total else 0.0,
+    }
+
+
 def aggregate(results: Dict[str, Any]) -> Dict[str, Any]:
     buckets: Dict[Tuple[str, str, float], List[Dict[str, Any]]] = {}
     for rec in results["records"]:
@@ -400,6 +1095,7 @@ def aggregate(results: Dict[str, Any]) -> Dict[str, Any]:
         buckets.setdefault(key, []).append(rec["result"])
 
     by_condition: List[Dict[str, Any]] = []
+    cached_all = uncached_all = 0
     for (scenario, model, temperature), trials in sorted(
         buckets.items(), key=lambda x: (x[0][2], x[0][1], x[0][0])
     ):
@@ -414,6 +1110,14 @@ def aggregate(results: Dict[str, Any]) -> Dict[str, Any]:
                 if len(pairs) == 1:
                     complete_consistency_turns += 1
 
+        cached = uncached = 0
+        for t in trials:
+            c, u = _input_token_split(t["turns"])
+            cached += c
+            uncached += u
+        cached_all += cached
+        uncached_all += uncached
+
         by_condition.append(
             {
                 "scenario": scenario,
@@ -427,27 +1131,203 @@ def aggregate(results: Dict[str, Any]) -> Dict[str, Any]:
                 "trial_turn_consistency": (
                     round(complete_consistency_turns / n_turns, 4) if n_turns else 0.0
                 ),
+                **_cache_summary(cached, uncached),
             }
         )
 
-    return {"by_condition": by_condition}
+    return {"by_condition": by_condition, "prompt_cache": _cache_summary(cached_all, uncached_all)}
+
+
+Condition = Tuple[str, str, float]  # (scenario, model, temperature)
+
+
+def estimate_task_tokens(
+    scenarios: Dict[str, Dict[str, Any]],
+    conditions: Iterable[Condition],
+    prior_paths: Iterable[str] = (),
+    top_k: int = 0,
+    explore: int = 0,
+) -> Dict[Condition, Tuple[float, str]]:
+    """Expected total tokens of one task per condition, with the estimate's source.
+
+    Uses the mean `total_tokens` of matching records in earlier results files
+    (same condition, else same scenario and model at any temperature). Without
+    history, falls back to estimate_tokens() of every turn's prompt plus a
+    short operator/target reply.
+    """
+    exact: Dict[Condition, List[int]] = {}
+    loose: Dict[Tuple[str, str], List[int]] = {}
+    for path in prior_paths:
+        for rec in iter_records(path):
+            total = rec["result"]["total_tokens"]
+            exact.setdefault((rec["scenario"], rec["model"], float(rec["temperature"])), []).append(total)
+            loose.setdefault((rec["scenario"], rec["model"]), []).append(total)
+
+    out: Dict[Condition, Tuple[float, str]] = {}
+    for cond in conditions:
+        scenario_key, model, _ = cond
+        if cond in exact:
+            out[cond] = (statistics.mean(exact[cond]), "prior_condition")
+        elif (scenario_key, model) in loose:
+            out[cond] = (statistics.mean(loose[(scenario_key, model)]), "prior_model")
+        else:
+            sc = scenarios[scenario_key]
+            items = list(sc["initial_state"])
+            if top_k > 0:
+                items = items[: top_k + explore]
+            reply = estimate_tokens(f"operator: {OPERATORS[0]}\ntarget: {max(items, key=len)}")
+            prompt = sum(
+                estimate_tokens(make_prompt(sc["domain"], items, parse_turn_text(turn))) for turn in sc["turns"]
+            )
+            out[cond] = (float(prompt + reply * len(sc["turns"])), "prompt_length")
+    return out
 
 
-def save_json(path: str, payload: Dict[str, Any]) -> None:
-    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+class BudgetScheduler:
+    """Admit tasks while the token budget and wall-clock deadline allow.
+
+    A task is admitted only if tokens already spent, plus the estimates of
+    tasks still in flight, plus its own estimate fit the budget, and if the
+    mean task duration so far still ends before the deadline. The first
+    refusal stops the schedule, so coverage follows the task order.
+    """
+
+    def __init__(
+        self,
+        token_budget: Optional[int],
+        deadline: Optional[float],
+        estimates: Dict[Condition, Tuple[float, str]],
+    ) -> None:
+        self.token_budget = token_budget
+        self.deadline = deadline
+        self.estimates = estimates
+        self.spent = 0
+        self.reserved = 0.0
+        self.durations: List[float] = []
+        self._started: Dict[int, float] = {}
+        self.admitted = 0
+        self.stopped: Optional[str] = None
+
+    def _estimate(self, t: Dict[str, Any]) -> float:
+        return self.estimates[(t["scenario_key"], t["model"], float(t["temperature"]))][0]
+
+    def admit(self, t: Dict[str, Any]) -> bool:
+        if self.stopped:
+            return False
+        est = self._estimate(t)
+        if self.token_budget is not None and self.spent + self.reserved + est > self.token_budget:
+            self.stopped = "token_budget"
+            return False
+        if self.deadline is not None:
+            expected = statistics.mean(self.durations) if self.durations else 0.0
+            if time.time() + expected > self.deadline:
+                self.stopped = "deadline"
+                return False
+        self.reserved += est
+        self.admitted += 1
+        self._started[id(t)] = time.perf_counter()
+        return True
+
+    def settle(self, t: Dict[str, Any], result: Dict[str, Any]) -> None:
+        self.reserved -= self._estimate(t)
+        self.spent += result["total_tokens"]
+        self.durations.append(time.perf_counter() - self._started.pop(id(t)))
+
+    def summary(self, planned: List[Dict[str, Any]], records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        cells = {(t["scenario_key"], t["model"], float(t["temperature"])) for t in planned}
+        trials: Dict[Condition, int] = {}
+        for rec in records:
+            cell = (rec["scenario"], rec["model"], float(rec["temperature"]))
+            trials[cell] = trials.get(cell, 0) + 1
+        cells |= set(trials)
+        per_cell = [trials.get(c, 0) for c in cells]
+        sources: Dict[str, int] = {}
+        for _, source in self.estimates.values():
+            sources[source] = sources.get(source, 0) + 1
+        return {
+            "token_budget": self.token_budget,
+            "deadline": datetime.fromtimestamp(self.deadline).isoformat() if self.deadline else None,
+            "tokens_spent": self.spent,
+            "tasks_planned": len(planned),
+            "tasks_run": len(self.durations),
+            "tasks_skipped": len(planned) - self.admitted,
+            "stopped": self.stopped,
+            "estimate_sources": sources,
+            "coverage": {
+                "cells": len(cells),
+                "cells_covered": sum(1 for n in per_cell if n),
+                "min_trials_per_cell": min(per_cell) if per_cell else 0,
+                "max_trials_per_cell": max(per_cell) if per_cell else 0,
+            },
+        }
+
+
+def parse_deadline(value: str) -> float:
+    """`--deadline`: seconds from now (e.g. `5400`) or an ISO date/time; returns epoch seconds."""
+    try:
+        return time.time() + float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def print_stage_summary(stages: Dict[str, Dict[str, float]]) -> None:
+    print(f"\n{'stage':<16} {'total s':>10} {'count':>8} {'mean ms':>10}")
+    for name, st in sorted(stages.items(), key=lambda x: -x[1]["total_s"]):
+        print(f"{name:<16} {st['total_s']:>10.3f} {st['count']:>8} {st['mean_ms']:>10.3f}")
+
+
+def add_profile_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--profile", action="store_true", help="Record per-stage timers in the output metadata"
+    )
+    parser.add_argument(
+        "--profile-cprofile",
+        metavar="PATH",
+        help="Also write cProfile stats (implies --profile). Only the main thread is profiled: "
+        "with --workers > 1, provider calls, extraction and state updates run on worker "
+        "threads and are missing from the stats",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        metavar="PATH",
+        help="Also trace memory; record the peak and dump a tracemalloc snapshot (implies --profile)",
+    )
 
 
 def parse_args() -> RunConfig:
     parser = argparse.ArgumentParser(description="Run Transfer 3-trial rebuild experiments.")
     parser.add_argument("--notebook", help="Path to source notebook (legacy compatibility)")
     parser.add_argument("--scenarios-json", help="Path to scenarios JSON (preferred for standalone runs)")
+    parser.add_argument(
+        "--scenarios-pack", help="Path to a compiled scenario pack (experiments/compile_scenarios.py)"
+    )
     parser.add_argument(
         "--out",
         default=f"transfer_3trial_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
         help="Output json path",
     )
+    parser.add_argument(
+        "--scenario-keys",
+        help="Comma-separated scenario keys, or 'all' for every scenario in the file "
+        "(default: the 18 protocol scenarios)",
+    )
+    parser.add_argument(
+        "--out-format",
+        choices=RESULT_FORMATS,
+        default="json",
+        help="json = pretty (published layout), compact = single-line JSON, jsonl = one record per line; "
+        "add .gz or .zst to --out to compress",
+    )
+    parser.add_argument(
+        "--responses-sidecar",
+        action="store_true",
+        help="Move raw responses to a deduplicated, content-addressed <out>.responses.jsonl side file",
+    )
+    parser.add_argument(
+        "--checksums",
+        action="store_true",
+        help="Write checksums_sha256.txt next to the output when the run finishes",
+    )
     parser.add_argument("--trials", type=int, default=3)
     parser.add_argument("--temperatures", default="0.3,0.0")
     parser.add_argument("--models", default="claude,gpt,gemini")
@@ -456,17 +1336,113 @@ def parse_args() -> RunConfig:
     parser.add_argument("--seed", type=int, default=20260208)
     parser.add_argument("--sleep-sec", type=float, default=0.3)
     parser.add_argument("--retry", type=int, default=5)
+    parser.add_argument(
+        "--provider",
+        choices=["api", "local"],
+        default="api",
+        help="api = hosted models; local = zero-latency offline stub (benchmarks, stress runs)",
+    )
+    add_profile_args(parser)
+    parser.add_argument(
+        "--prompt-cache",
+        action="store_true",
+        help="Send the item list and instructions as a cacheable prefix (changes prompt layout)",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=0,
+        help="Large-candidate mode: show only the top-k items by weight (0 = full list)",
+    )
+    parser.add_argument(
+        "--explore",
+        type=int,
+        default=0,
+        help="Extra items sampled outside the top-k window per turn (with --top-k)",
+    )
+    parser.add_argument(
+        "--endpoints-json",
+        help="OpenAI-compatible endpoints per model key (see experiments/endpoint_clients.py); "
+        "their keys can be used in --models alongside claude/gpt/gemini",
+    )
+    parser.add_argument(
+        "--endpoint-max-connections",
+        type=int,
+        default=32,
+        help="Keep-alive connections per endpoint for --endpoints-json",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Run up to N tasks concurrently (default: 1, sequential)"
+    )
+    parser.add_argument(
+        "--coalesce",
+        action="store_true",
+        help="Share one provider request among identical in-flight prompts of the same "
+        "temperature-0.0 condition (needs --workers > 1 to have any effect)",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        help="Stop admitting tasks once spent plus in-flight estimated tokens would exceed this total; "
+        "tasks then run trial by trial so every condition is covered before extra trials",
+    )
+    parser.add_argument(
+        "--deadline",
+        help="Stop admitting tasks that would not finish by this time: seconds from now or an ISO "
+        "date/time (same trial-by-trial ordering as --token-budget)",
+    )
+    parser.add_argument(
+        "--cost-from",
+        help="Comma-separated earlier results files for per-condition token estimates "
+        "(default: --diff-against if given, else prompt-length estimates)",
+    )
+    parser.add_argument(
+        "--diff-against",
+        metavar="RESULTS",
+        help="Differential mode: reuse records from RESULTS whose input fingerprint still matches "
+        "and has no error turns, run only the stale tasks, and keep RESULTS' records for other "
+        "conditions",
+    )
+    parser.add_argument(
+        "--diff-dry-run",
+        action="store_true",
+        help="With --diff-against: report stale/reusable task counts and exit without calling providers",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve Prometheus-style live metrics at http://<host>:<port>/metrics (0 = any free port)",
+    )
+    parser.add_argument("--metrics-host", default="127.0.0.1")
 
     a = parser.parse_args()
     temperatures = [float(x.strip()) for x in a.temperatures.split(",") if x.strip()]
     models = [x.strip() for x in a.models.split(",") if x.strip()]
+    scenario_keys = None
+    if a.scenario_keys:
+        scenario_keys = [x.strip() for x in a.scenario_keys.split(",") if x.strip()]
+    endpoints = load_endpoints(a.endpoints_json) if a.endpoints_json else {}
+    for key, spec in endpoints.items():
+        if key in MODEL_IDS:
+            raise ValueError(f"Endpoint key {key!r} shadows a built-in model")
+        MODEL_IDS[key] = spec["model"]
     for m in models:
         if m not in MODEL_IDS:
             raise ValueError(f"Unknown model: {m}")
+    if a.workers < 1:
+        raise ValueError("--workers must be >= 1")
+    cost_from = [x.strip() for x in a.cost_from.split(",") if x.strip()] if a.cost_from else []
+    if not cost_from and a.diff_against:
+        cost_from = [a.diff_against]
     return RunConfig(
         notebook_path=a.notebook,
         scenarios_json=a.scenarios_json,
+        scenarios_pack=a.scenarios_pack,
         out_json=a.out,
+        scenario_keys=scenario_keys,
+        out_format=a.out_format,
+        responses_sidecar=a.responses_sidecar,
+        checksums=a.checksums,
         trials=a.trials,
         temperatures=temperatures,
         models=models,
@@ -475,28 +1451,69 @@ def parse_args() -> RunConfig:
         seed=a.seed,
         sleep_sec=a.sleep_sec,
         retry=a.retry,
+        prompt_cache=a.prompt_cache,
+        top_k=a.top_k,
+        explore=a.explore,
+        provider=a.provider,
+        endpoints=endpoints,
+        endpoint_max_connections=a.endpoint_max_connections,
+        workers=a.workers,
+        coalesce=a.coalesce,
+        token_budget=a.token_budget,
+        deadline=parse_deadline(a.deadline) if a.deadline else None,
+        cost_from=cost_from,
+        diff_against=a.diff_against,
+        diff_dry_run=a.diff_dry_run,
+        metrics_port=a.metrics_port,
+        metrics_host=a.metrics_host,
+        profile=a.profile,
+        profile_cprofile=a.profile_cprofile,
+        profile_memory=a.profile_memory,
     )
 
 
 def main() -> None:
     cfg = parse_args()
+    profiler = RunProfiler(cfg.profile, cfg.profile_cprofile, cfg.profile_memory)
+    profiler.start()
+    try:
+        run_experiment(cfg, profiler)
+    finally:
+        # Early returns (--diff-dry-run) and errors still flush cProfile/tracemalloc output.
+        profiler.stop()
+
+
+def run_experiment(cfg: RunConfig, profiler: RunProfiler) -> None:
     random.seed(cfg.seed)
-    if cfg.scenarios_json:
-        with open(cfg.scenarios_json, "r", encoding="utf-8") as f:
-            scenarios = json.load(f)
-    elif cfg.notebook_path:
-        scenarios = load_scenarios_from_notebook(cfg.notebook_path)
-    else:
-        raise ValueError("Provide either --scenarios-json or --notebook.")
-    missing = [k for k in TRANSFER_SCENARIOS if k not in scenarios]
-    if missing:
-        raise ValueError(f"Missing scenarios in notebook: {missing}")
+    timer = profiler.timer
+
+    with timer.stage("scenario_load"):
+        if cfg.scenarios_pack:
+            scenarios = load_scenario_pack(cfg.scenarios_pack)
+        elif cfg.scenarios_json:
+            with open(cfg.scenarios_json, "r", encoding="utf-8") as f:
+                scenarios = json.load(f)
+        elif cfg.notebook_path:
+            scenarios = load_scenarios_from_notebook(cfg.notebook_path)
+        else:
+            raise ValueError("Provide one of --scenarios-pack, --scenarios-json or --notebook.")
+        if cfg.scenario_keys == ["all"]:
+            scenario_keys = list(scenarios)
+        else:
+            scenario_keys = cfg.scenario_keys or TRANSFER_SCENARIOS
+        missing = [k for k in scenario_keys if k not in scenarios]
+        if missing:
+            raise ValueError(f"Missing scenarios in notebook: {missing}")
+        # Packs were validated by compile_scenarios.py; only raw sources are checked here.
+        errors = [] if cfg.scenarios_pack else validate_scenarios({k: scenarios[k] for k in scenario_keys})
+        if errors:
+            raise ValueError("Invalid scenarios:\n- " + "\n- ".join(errors))
 
     tasks = []
     for model in cfg.models:
         for temp in cfg.temperatures:
             for trial in range(1, cfg.trials + 1):
-                for scenario_key in TRANSFER_SCENARIOS:
+                for scenario_key in scenario_keys:
                     tasks.append(
                         {
                             "model": model,
@@ -507,6 +1524,65 @@ def main() -> None:
                     )
     random.shuffle(tasks)
 
+    fingerprints: Dict[Tuple[str, str, float], str] = {}
+    for t in tasks:
+        fp_key = (t["scenario_key"], t["model"], t["temperature"])
+        if fp_key not in fingerprints:
+            fingerprints[fp_key] = task_fingerprint(
+                scenarios[t["scenario_key"]],
+                MODEL_IDS[t["model"]],
+                t["temperature"],
+                cfg.max_tokens,
+                cfg.alpha,
+                cfg.prompt_cache,
+                cfg.top_k,
+                cfg.explore,
+                cfg.provider,
+                cfg.endpoints.get(t["model"], {}).get("base_url"),
+            )
+        t["fingerprint"] = fingerprints[fp_key]
+
+    reused: List[Dict[str, Any]] = []
+    carried: List[Dict[str, Any]] = []
+    if cfg.diff_against:
+        base = load_results(cfg.diff_against)
+        task_keys = {(t["model"], float(t["temperature"]), t["trial"], t["scenario_key"]) for t in tasks}
+        # Records outside this run's models/temperatures/trials/scenarios are merged back unchanged.
+        carried = [rec for rec in base["records"] if record_key(rec) not in task_keys]
+        base_index = {record_key(rec): rec for rec in base["records"] if rec.get("fingerprint")}
+        stale = []
+        retried = 0
+        for t in tasks:
+            rec = base_index.get((t["model"], float(t["temperature"]), t["trial"], t["scenario_key"]))
+            if rec is not None and rec["fingerprint"] == t["fingerprint"]:
+                if any("error" in turn for turn in rec["result"]["turns"]):
+                    retried += 1  # a provider error is not a result worth keeping
+                    stale.append(t)
+                else:
+                    reused.append(rec)
+            else:
+                stale.append(t)
+        calls_avoided = sum(len(rec["result"]["turns"]) for rec in reused)
+        print(
+            f"Differential: {len(reused)} task(s) reused, {len(stale)} stale "
+            f"({retried} with error turns); {calls_avoided} provider call(s) avoided; "
+            f"{len(carried)} record(s) from other conditions carried over"
+        )
+        if os.path.abspath(cfg.out_json) == os.path.abspath(cfg.diff_against):
+            print(f"Updating {cfg.out_json} in place")
+        if cfg.diff_dry_run:
+            return
+        differential = {
+            "base": cfg.diff_against,
+            "reused_tasks": len(reused),
+            "executed_tasks": len(stale),
+            "retried_error_tasks": retried,
+            "carried_records": len(carried),
+            "calls_avoided": calls_avoided,
+        }
+        task_count = len(tasks)
+        tasks = stale
+
     payload: Dict[str, Any] = {
         "metadata": {
             "created_at": datetime.now().isoformat(),
@@ -517,18 +1593,79 @@ def main() -> None:
             "max_tokens": cfg.max_tokens,
             "alpha": cfg.alpha,
             "seed": cfg.seed,
+            "prompt_cache": cfg.prompt_cache,
+            "top_k": cfg.top_k,
+            "explore": cfg.explore,
+            "provider": cfg.provider,
+            "out_format": cfg.out_format,
             "task_count": len(tasks),
+            "workers": cfg.workers,
         },
-        "records": [],
+        "records": carried + reused,
         "aggregation": {},
     }
-
-    clients = LLMClients()
-    for idx, t in enumerate(tasks, start=1):
-        key = f"{t['model']}|temp={t['temperature']}|trial={t['trial']}|{t['scenario_key']}"
-        print(f"[{idx}/{len(tasks)}] {key}")
-        result = run_one_scenario(
-            clients=clients,
+    if cfg.endpoints:
+        payload["metadata"]["endpoints"] = endpoint_summary(cfg.endpoints)
+    if cfg.diff_against:
+        payload["metadata"]["task_count"] = task_count
+        payload["metadata"]["differential"] = differential
+    if carried:
+        # Describe every model and temperature present in the merged records.
+        base_meta = base.get("metadata", {})
+        payload["metadata"]["models"] = {**base_meta.get("models", {}), **payload["metadata"]["models"]}
+        payload["metadata"]["temperatures"] = sorted(
+            set(cfg.temperatures) | {float(rec["temperature"]) for rec in carried}
+        )
+        payload["metadata"]["trials"] = max([cfg.trials] + [int(rec["trial"]) for rec in carried])
+
+    metrics: Optional[RunMetrics] = None
+    metrics_server: Optional[MetricsServer] = None
+    if cfg.metrics_port is not None:
+        metrics = RunMetrics(tasks_total=len(tasks))
+        metrics_server = MetricsServer(metrics, cfg.metrics_port, cfg.metrics_host).start()
+        print(f"Metrics: {metrics_server.url}")
+
+    clients: Any = (
+        LocalClients()
+        if cfg.provider == "local"
+        else LLMClients(cfg.endpoints, cfg.endpoint_max_connections)
+    )
+    scheduler: Optional[BudgetScheduler] = None
+    if cfg.token_budget is not None or cfg.deadline is not None:
+        # Trial-major order (shuffled within each trial round): every
+        # (scenario, model, temperature) cell gets a trial before any gets two.
+        tasks.sort(key=lambda t: t["trial"])
+        conditions = {(t["scenario_key"], t["model"], float(t["temperature"])) for t in tasks}
+        scheduler = BudgetScheduler(
+            cfg.token_budget,
+            cfg.deadline,
+            estimate_task_tokens(scenarios, conditions, cfg.cost_from, cfg.top_k, cfg.explore),
+        )
+    planned = list(tasks)
+
+    coalescer: Optional[CoalescingClients] = None
+    if cfg.coalesce:
+        coalescer = CoalescingClients(clients)
+        if cfg.workers > 1 and scheduler is None:
+            # Start the trials of each temperature-0.0 condition back to back so
+            # they are in flight together; they then stay in step turn by turn.
+            first: Dict[Tuple[str, str], int] = {}
+            rank = []
+            for i, t in enumerate(tasks):
+                if t["temperature"] == 0.0:
+                    rank.append(first.setdefault((t["scenario_key"], t["model"]), i))
+                else:
+                    rank.append(i)
+            tasks = [t for _, _, t in sorted(zip(rank, range(len(tasks)), tasks), key=lambda x: x[:2])]
+
+    def run_task(t: Dict[str, Any]) -> Dict[str, Any]:
+        task_clients = clients
+        if coalescer is not None:
+            task_clients = coalescer.scoped(
+                coalesce_scope(t["scenario_key"], t["model"], t["temperature"], t["trial"])
+            )
+        return run_one_scenario(
+            clients=task_clients,
             scenario_key=t["scenario_key"],
             scenario=scenarios[t["scenario_key"]],
             model=t["model"],
@@ -537,19 +1674,101 @@ def main() -> None:
             alpha=cfg.alpha,
             retry=cfg.retry,
             sleep_sec=cfg.sleep_sec,
+            prompt_cache=cfg.prompt_cache,
+            top_k=cfg.top_k,
+            explore=cfg.explore,
+            timer=timer,
+            metrics=metrics,
         )
+
+    def finish_task(idx: int, t: Dict[str, Any], result: Dict[str, Any]) -> List[str]:
+        key = f"{t['model']}|temp={t['temperature']}|trial={t['trial']}|{t['scenario_key']}"
+        print(f"[{idx}/{len(tasks)}] {key}")
+        if metrics is not None:
+            metrics.task_finished()
+        if scheduler is not None:
+            scheduler.settle(t, result)
         payload["records"].append(
             {
                 "model": t["model"],
                 "temperature": t["temperature"],
                 "trial": t["trial"],
                 "scenario": t["scenario_key"],
+                "fingerprint": t["fingerprint"],
                 "result": result,
             }
         )
+        with timer.stage("aggregation"):
+            payload["aggregation"] = aggregate(payload)
+        if coalescer is not None:
+            payload["metadata"]["coalescing"] = coalescer.summary()
+        if scheduler is not None:
+            payload["metadata"]["budget"] = scheduler.summary(planned, payload["records"][len(carried) :])
+        if profiler.enabled:
+            payload["metadata"]["profile"] = profiler.summary()
+        with timer.stage("save"):
+            return save_results(cfg.out_json, payload, cfg.out_format, cfg.responses_sidecar)
+
+    def admit(t: Dict[str, Any]) -> bool:
+        return scheduler is None or scheduler.admit(t)
+
+    # Records are appended and saved on the main thread only; workers just call providers.
+    done = 0
+    if cfg.workers == 1:
+        for t in tasks:
+            if not admit(t):
+                break
+            done += 1
+            written = finish_task(done, t, run_task(t))
+    else:
+        pending = iter(tasks)
+        inflight: Dict[Future, Dict[str, Any]] = {}
+        with ThreadPoolExecutor(max_workers=cfg.workers) as pool:
+            while True:
+                # Submit lazily so the budget check sees what the finished tasks actually spent.
+                while len(inflight) < cfg.workers:
+                    t = next(pending, None)
+                    if t is None or not admit(t):
+                        break
+                    inflight[pool.submit(run_task, t)] = t
+                if not inflight:
+                    break
+                finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    done += 1
+                    written = finish_task(done, inflight.pop(fut), fut.result())
+    if isinstance(clients, LLMClients):
+        clients.close()
+    if coalescer is not None:
+        c = coalescer.summary()
+        print(f"Coalescing: {c['provider_calls']} provider call(s), {c['coalesced_calls']} saved")
+
+    if scheduler is not None:
+        b = scheduler.summary(planned, payload["records"][len(carried) :])
+        payload["metadata"]["budget"] = b
+        cov = b["coverage"]
+        print(
+            f"Budget: {b['tokens_spent']} tokens spent, {b['tasks_run']}/{b['tasks_planned']} tasks, "
+            f"{cov['cells_covered']}/{cov['cells']} cells covered"
+            + (f" (stopped: {b['stopped']})" if b["stopped"] else "")
+        )
+    if not done:
+        # Nothing ran (all reused, or the budget admitted no task): still write the results.
         payload["aggregation"] = aggregate(payload)
-        save_json(cfg.out_json, payload)
-
+        written = save_results(cfg.out_json, payload, cfg.out_format, cfg.responses_sidecar)
+    elif scheduler is not None:
+        written = save_results(cfg.out_json, payload, cfg.out_format, cfg.responses_sidecar)
+    if profiler.enabled:
+        profiler.stop()
+        payload["metadata"]["profile"] = profiler.summary()
+        written = save_results(cfg.out_json, payload, cfg.out_format, cfg.responses_sidecar)
+        print_stage_summary(payload["metadata"]["profile"]["stages"])
+    if cfg.checksums:
+        checksum_path = os.path.join(os.path.dirname(cfg.out_json), "checksums_sha256.txt")
+        write_checksums(written, checksum_path)
+        print(f"Checksums: {checksum_path}")
+    if metrics_server is not None:
+        metrics_server.stop()
     print(f"\nDone. Saved: {cfg.out_json}")
 
 
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Stress runs on synthetic scenarios with the offline local provider.
+
+For each turn-count level, generates scenarios, drives run_one_scenario through
+LocalClients (no network, no sleep), then aggregates and saves the results
+once, reporting throughput per phase and, with --memory, the tracemalloc peak.
+`checkpoint_s` is the cost of one aggregate + save at the final size, which
+run_transfer_3trial.py pays after every task.
+
+  python3 experiments/stress_transfer.py --levels 10000,100000,1000000 --items 50 --out stress.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict
+
+from generate_synthetic_scenarios import generate_scenarios
+from results_io import save_json
+from run_transfer_3trial import DOMAIN_PROMPTS, LocalClients, aggregate, run_one_scenario
+
+
+def stress_level(
+    total_turns: int,
+    n_items: int,
+    turns_per_scenario: int,
+    top_k: int,
+    memory: bool,
+    seed: int,
+    tmp: str,
+) -> Dict[str, Any]:
+    n_scenarios = max(1, total_turns // turns_per_scenario)
+    scenarios = generate_scenarios(
+        n_scenarios, n_items, turns_per_scenario, list(DOMAIN_PROMPTS), 0.2, 0.7, seed
+    )
+    clients = LocalClients()
+    if memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    records = []
+    for key, sc in scenarios.items():
+        result = run_one_scenario(
+            clients=clients,
+            scenario_key=key,
+            scenario=sc,
+            model="gpt",
+            temperature=0.0,
+            max_tokens=200,
+            alpha=0.4,
+            retry=1,
+            sleep_sec=0.0,
+            top_k=top_k,
+        )
+        records.append(
+            {"model": "gpt", "temperature": 0.0, "trial": 1, "scenario": key, "result": result}
+        )
+    run_s = time.perf_counter() - start
+
+    payload: Dict[str, Any] = {"metadata": {"script": "stress_transfer.py"}, "records": records}
+    start = time.perf_counter()
+    payload["aggregation"] = aggregate(payload)
+    aggregate_s = time.perf_counter() - start
+
+    path = os.path.join(tmp, f"stress_{total_turns}.json")
+    start = time.perf_counter()
+    save_json(path, payload)
+    save_s = time.perf_counter() - start
+    size = os.path.getsize(path)
+    os.remove(path)
+
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    n_turns = n_scenarios * turns_per_scenario
+    return {
+        "turns": n_turns,
+        "scenarios": n_scenarios,
+        "items": n_items,
+        "top_k": top_k,
+        "run_s": round(run_s, 4),
+        "turns_per_s": round(n_turns / run_s, 1) if run_s else None,
+        "aggregate_s": round(aggregate_s, 4),
+        "save_s": round(save_s, 4),
+        "checkpoint_s": round(aggregate_s + save_s, 4),
+        "output_bytes": size,
+        "peak_memory_bytes": peak,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stress the runner pipeline on synthetic scenarios.")
+    parser.add_argument("--levels", default="10000,100000", help="Comma-separated total turn counts")
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--turns-per-scenario", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=0, help="Use top-k windowing (0 = full list)")
+    parser.add_argument("--memory", action="store_true", help="Trace peak memory (slower)")
+    parser.add_argument("--seed", type=int, default=20260208)
+    parser.add_argument("--out", help="Optional JSON report path")
+    a = parser.parse_args()
+
+    levels = [int(float(x)) for x in a.levels.split(",") if x.strip()]
+    rows = []
+    print(f"{'turns':>9} {'turns/s':>10} {'run s':>9} {'aggregate s':>12} {'save s':>9} {'MB out':>8} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for level in levels:
+            row = stress_level(level, a.items, a.turns_per_scenario, a.top_k, a.memory, a.seed, tmp)
+            rows.append(row)
+            peak = f"{row['peak_memory_bytes'] / 1e6:.1f}" if row["peak_memory_bytes"] else "-"
+            print(
+                f"{row['turns']:>9} {row['turns_per_s']:>10} {row['run_s']:>9} "
+                f"{row['aggregate_s']:>12} {row['save_s']:>9} {row['output_bytes'] / 1e6:>8.1f} {peak:>8}"
+            )
+    if a.out:
+        save_json(
+            a.out,
+            {
+                "metadata": {
+                    "created_at": datetime.now().isoformat(),
+                    "script": "stress_transfer.py",
+                    "items": a.items,
+                    "turns_per_scenario": a.turns_per_scenario,
+                    "top_k": a.top_k,
+                    "seed": a.seed,
+                },
+                "levels": rows,
+            },
+        )
+        print(f"\nSaved: {a.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Live run metrics in Prometheus text format (optional local HTTP endpoint).
+
+RunMetrics is updated from run_one_scenario/main and rendered on demand;
+every update is a few dict operations under one lock. MetricsServer serves
+`render()` at /metrics from a daemon thread, so a run can be scraped with
+`curl http://127.0.0.1:<port>/metrics`. Both work offline: `render()` needs
+no server, and the server can bind port 0 for an ephemeral port.
+"""
+
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+PREFIX = "nrr_transfer"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class RunMetrics:
+    def __init__(self, tasks_total: int = 0) -> None:
+        self._lock = threading.Lock()
+        self.tasks_total = tasks_total
+        self.tasks_done = 0
+        self.inflight: Dict[str, int] = {}
+        self.calls: Dict[Tuple[str, str], int] = {}  # (model, "ok"|"error")
+        self.retries: Dict[str, int] = {}
+        self.latency_buckets: Dict[str, List[int]] = {}
+        self.latency_sum: Dict[str, float] = {}
+        self.tokens: Dict[Tuple[str, str], int] = {}  # (model, kind)
+        self.extractions: Dict[Tuple[str, str], int] = {}  # (model, "success"|"failure")
+
+    def task_finished(self) -> None:
+        with self._lock:
+            self.tasks_done += 1
+
+    def call_started(self, model: str) -> None:
+        with self._lock:
+            self.inflight[model] = self.inflight.get(model, 0) + 1
+
+    def call_finished(self, model: str, latency_s: float, ok: bool) -> None:
+        with self._lock:
+            self.inflight[model] = self.inflight.get(model, 0) - 1
+            key = (model, "ok" if ok else "error")
+            self.calls[key] = self.calls.get(key, 0) + 1
+            buckets = self.latency_buckets.setdefault(model, [0] * (len(LATENCY_BUCKETS) + 1))
+            buckets[bisect_left(LATENCY_BUCKETS, latency_s)] += 1
+            self.latency_sum[model] = self.latency_sum.get(model, 0.0) + latency_s
+
+    def retry(self, model: str) -> None:
+        with self._lock:
+            self.retries[model] = self.retries.get(model, 0) + 1
+
+    def add_tokens(self, model: str, inp: int, out: int, cached: int) -> None:
+        with self._lock:
+            for kind, n in (("input", inp), ("output", out), ("cached_input", cached)):
+                self.tokens[(model, kind)] = self.tokens.get((model, kind), 0) + n
+
+    def extraction(self, model: str, success: bool) -> None:
+        with self._lock:
+            key = (model, "success" if success else "failure")
+            self.extractions[key] = self.extractions.get(key, 0) + 1
+
+    def render(self) -> str:
+        with self._lock:
+            lines: List[str] = []
+
+            def family(name: str, kind: str, help_text: str) -> str:
+                full = f"{PREFIX}_{name}"
+                lines.append(f"# HELP {full} {help_text}")
+                lines.append(f"# TYPE {full} {kind}")
+                return full
+
+            name = family("tasks_done", "gauge", "Tasks (scenario runs) finished.")
+            lines.append(f"{name} {self.tasks_done}")
+            name = family("tasks_pending", "gauge", "Tasks not finished yet.")
+            lines.append(f"{name} {max(0, self.tasks_total - self.tasks_done)}")
+
+            name = family("inflight_calls", "gauge", "Provider calls currently in flight.")
+            for model, n in sorted(self.inflight.items()):
+                lines.append(f'{name}{{model="{model}"}} {n}')
+            name = family("calls_total", "counter", "Provider call attempts by outcome.")
+            for (model, outcome), n in sorted(self.calls.items()):
+                lines.append(f'{name}{{model="{model}",outcome="{outcome}"}} {n}')
+            name = family("retries_total", "counter", "Provider calls retried after an error.")
+            for model, n in sorted(self.retries.items()):
+                lines.append(f'{name}{{model="{model}"}} {n}')
+
+            name = family("call_latency_seconds", "histogram", "Provider call latency.")
+            for model, buckets in sorted(self.latency_buckets.items()):
+                cumulative = 0
+                for le, n in zip([*map(str, LATENCY_BUCKETS), "+Inf"], buckets):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{model="{model}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{model="{model}"}} {self.latency_sum[model]:.6f}')
+                lines.append(f'{name}_count{{model="{model}"}} {cumulative}')
+
+            name = family("tokens_total", "counter", "Tokens consumed by kind.")
+            for (model, kind), n in sorted(self.tokens.items()):
+                lines.append(f'{name}{{model="{model}",kind="{kind}"}} {n}')
+
+            name = family("extractions_total", "counter", "Operator/target extraction results.")
+            for (model, result), n in sorted(self.extractions.items()):
+                lines.append(f'{name}{{model="{model}",result="{result}"}} {n}')
+            name = family("extraction_success_ratio", "gauge", "Share of turns with a valid operator and target.")
+            for model in sorted({m for m, _ in self.extractions}):
+                ok = self.extractions.get((model, "success"), 0)
+                total = ok + self.extractions.get((model, "failure"), 0)
+                lines.append(f'{name}{{model="{model}"}} {ok / total:.6f}')
+            return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serve RunMetrics.render() at /metrics from a daemon thread."""
+
+    def __init__(self, metrics: RunMetrics, port: int, host: str = "127.0.0.1") -> None:
+        self.metrics = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802 (http.server API)
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self) -> "MetricsServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -1,26 +1,41 @@
 #!/usr/bin/env python3
-import json
+import argparse
 import statistics
-import collections
 import os
+import sys
 from pathlib import Path
 import numpy as np
 import matplotlib.pyplot as plt
 
 ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "experiments"))
+from analyze_results import analyze, temperature_means  # noqa: E402
+from results_io import load_results, save_json  # noqa: E402
+from run_transfer_3trial import RunProfiler, add_profile_args, print_stage_summary  # noqa: E402
+
+parser = argparse.ArgumentParser(description="Regenerate Paper 5 figures from a results JSON.")
+add_profile_args(parser)
+parser.add_argument("--profile-out", metavar="PATH", help="Write the stage breakdown as JSON (implies --profile)")
+args = parser.parse_args()
+profiler = RunProfiler(args.profile or bool(args.profile_out), args.profile_cprofile, args.profile_memory)
+timer = profiler.timer
+profiler.start()
+
 RESULTS = Path(
     os.getenv(
         "TRANSFER_RESULTS_JSON",
         str(ROOT / "data" / "results" / "transfer_3trial_results.json"),
     )
 )
-OUT2 = ROOT / "figures" / "paper5_fig2_all_domains.png"
-OUT4 = ROOT / "figures" / "paper5_fig4_operator_heatmap.png"
+OUT_DIR = Path(os.getenv("TRANSFER_FIGURES_DIR", str(ROOT / "figures")))
+OUT2 = OUT_DIR / "paper5_fig2_all_domains.png"
+OUT4 = OUT_DIR / "paper5_fig4_operator_heatmap.png"
 
 if not RESULTS.exists():
     raise FileNotFoundError(
         f"Results JSON not found: {RESULTS}. Set TRANSFER_RESULTS_JSON to a private output file."
     )
+OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 scenario_order = [
     "bank","spring","court",
@@ -40,69 +55,72 @@ name_map = {
     "multimodal_brand":"Multimodal\n(brand)","multimodal_audience":"Multimodal\n(audience)","multimodal_competitive":"Multimodal\n(competitive)","multimodal_abtest":"Multimodal\n(abtest)",
 }
 
-with open(RESULTS, encoding="utf-8") as f:
-    data = json.load(f)
-records = data["records"]
+with timer.stage("load"):
+    # Any layout written by the runner (.json, .json.gz, .jsonl[.gz|.zst], response side files).
+    data = load_results(str(RESULTS), resolve_responses=False)
+    records = data["records"]
 
-sc_domain = {}
-for rec in records:
-    sc_domain[rec["scenario"]] = rec["result"]["domain"]
+with timer.stage("aggregation"):
+    # One pass over the records for both figures.
+    stats = analyze(records)
+sc_domain = {sc: st["domain"] for sc, st in stats["scenarios"].items()}
 color_map = {
     "IME":"#5A9ECF", "RAG":"#63BC69", "Agent":"#DE77AE",
     "Planning":"#5A9ECF", "Multi-agent":"#63BC69", "Multimodal":"#DE77AE"
 }
 
-vals = collections.defaultdict(list)
-for rec in records:
-    if float(rec["temperature"]) == 0.3:
-        vals[rec["scenario"]].append(rec["result"]["avg_per_turn"])
-means = [statistics.mean(vals[s]) for s in scenario_order]
+temp_means = temperature_means(stats, 0.3)
+means = [temp_means[s] for s in scenario_order]
 overall = statistics.mean(means)
 
-plt.figure(figsize=(16,5.8))
-x = np.arange(len(scenario_order))
-plt.bar(x, means, color=[color_map[sc_domain[s]] for s in scenario_order], edgecolor="black", linewidth=1.2)
-plt.axhline(overall, color="red", linestyle="--", linewidth=2.2, label=f"Average ({overall:.1f})")
-for i,v in enumerate(means):
-    plt.text(i, v+1.2, f"{v:.1f}", ha="center", va="bottom", fontsize=8)
-plt.title("Token Consumption Across All Domains (Phase 1.5, T=0.3, 3 models x 3 trials)", fontsize=17, weight="bold")
-plt.ylabel("Tokens per Turn", fontsize=14, weight="bold")
-plt.xlabel("Domain & Scenario", fontsize=14, weight="bold")
-plt.xticks(x, [name_map[s] for s in scenario_order], fontsize=9)
-plt.ylim(0, max(means)+18)
-plt.grid(axis="y", alpha=0.3)
-plt.legend(loc="upper right", framealpha=0.9)
-plt.tight_layout()
-plt.savefig(OUT2, dpi=220)
+with timer.stage("render"):
+    plt.figure(figsize=(16,5.8))
+    x = np.arange(len(scenario_order))
+    plt.bar(x, means, color=[color_map[sc_domain[s]] for s in scenario_order], edgecolor="black", linewidth=1.2)
+    plt.axhline(overall, color="red", linestyle="--", linewidth=2.2, label=f"Average ({overall:.1f})")
+    for i,v in enumerate(means):
+        plt.text(i, v+1.2, f"{v:.1f}", ha="center", va="bottom", fontsize=8)
+    plt.title("Token Consumption Across All Domains (Phase 1.5, T=0.3, 3 models x 3 trials)", fontsize=17, weight="bold")
+    plt.ylabel("Tokens per Turn", fontsize=14, weight="bold")
+    plt.xlabel("Domain & Scenario", fontsize=14, weight="bold")
+    plt.xticks(x, [name_map[s] for s in scenario_order], fontsize=9)
+    plt.ylim(0, max(means)+18)
+    plt.grid(axis="y", alpha=0.3)
+    plt.legend(loc="upper right", framealpha=0.9)
+    plt.tight_layout()
+with timer.stage("save"):
+    plt.savefig(OUT2, dpi=220)
 plt.close()
 
-sigma = collections.Counter(); delta = collections.Counter(); count = collections.Counter()
-for rec in records:
-    sc = rec["scenario"]
-    for t in rec["result"]["turns"]:
-        op = t.get("operator")
-        if op == "sigma": sigma[sc] += 1
-        elif op == "delta": delta[sc] += 1
-        count[sc] += 1
-sigma_pct = [100.0 * sigma[s] / count[s] if count[s] else 0.0 for s in scenario_order]
-delta_pct = [100.0 * delta[s] / count[s] if count[s] else 0.0 for s in scenario_order]
+sigma_pct = [stats["scenarios"][s]["sigma_pct"] for s in scenario_order]
+delta_pct = [stats["scenarios"][s]["delta_pct"] for s in scenario_order]
 
-plt.figure(figsize=(14,10.8))
-y = np.arange(len(scenario_order))
-plt.barh(y, sigma_pct, color="#5A9ECF", edgecolor="black", label="σ (strengthen)")
-plt.barh(y, delta_pct, left=sigma_pct, color="#E45B4E", edgecolor="black", label="δ (dampen)")
-for i,(sp,dp) in enumerate(zip(sigma_pct, delta_pct)):
-    if sp > 8: plt.text(sp/2, i, f"{sp:.0f}%", ha="center", va="center", color="white", fontsize=9, weight="bold")
-    if dp > 8: plt.text(sp+dp/2, i, f"{dp:.0f}%", ha="center", va="center", color="white", fontsize=9, weight="bold")
-plt.yticks(y, [name_map[s].replace("\n"," ") for s in scenario_order], fontsize=10)
-plt.xlabel("Operator Usage (%)", fontsize=15, weight="bold")
-plt.title("Operator Selection Patterns Across 18 Scenarios\n(All 324 runs: 3 models x 2 temperatures x 3 trials)", fontsize=18, weight="bold")
-plt.xlim(0,100)
-plt.grid(axis="x", alpha=0.25)
-plt.legend(loc="lower right", fontsize=11, framealpha=0.95)
-plt.tight_layout()
-plt.savefig(OUT4, dpi=220)
+with timer.stage("render"):
+    plt.figure(figsize=(14,10.8))
+    y = np.arange(len(scenario_order))
+    plt.barh(y, sigma_pct, color="#5A9ECF", edgecolor="black", label="σ (strengthen)")
+    plt.barh(y, delta_pct, left=sigma_pct, color="#E45B4E", edgecolor="black", label="δ (dampen)")
+    for i,(sp,dp) in enumerate(zip(sigma_pct, delta_pct)):
+        if sp > 8: plt.text(sp/2, i, f"{sp:.0f}%", ha="center", va="center", color="white", fontsize=9, weight="bold")
+        if dp > 8: plt.text(sp+dp/2, i, f"{dp:.0f}%", ha="center", va="center", color="white", fontsize=9, weight="bold")
+    plt.yticks(y, [name_map[s].replace("\n"," ") for s in scenario_order], fontsize=10)
+    plt.xlabel("Operator Usage (%)", fontsize=15, weight="bold")
+    plt.title("Operator Selection Patterns Across 18 Scenarios\n(All 324 runs: 3 models x 2 temperatures x 3 trials)", fontsize=18, weight="bold")
+    plt.xlim(0,100)
+    plt.grid(axis="x", alpha=0.25)
+    plt.legend(loc="lower right", fontsize=11, framealpha=0.95)
+    plt.tight_layout()
+with timer.stage("save"):
+    plt.savefig(OUT4, dpi=220)
 plt.close()
 
 print("saved", OUT2)
 print("saved", OUT4)
+
+if profiler.enabled:
+    profiler.stop()
+    profile = profiler.summary()
+    print_stage_summary(profile["stages"])
+    if args.profile_out:
+        save_json(args.profile_out, {"results": str(RESULTS), "profile": profile})
+        print("saved", args.profile_out)